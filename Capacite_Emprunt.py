@@ -8,12 +8,38 @@ st.set_page_config(
 )
 
 import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
 import pandas as pd
-from fpdf import FPDF
-import tempfile
-from datetime import datetime
+from functools import partial
+from importlib.util import find_spec
+
+from simulateur.amortization import SCHEDULE_COLUMNS, amortization_schedule
+from simulateur.bank_exact import ROUND_HALF_UP, ROUNDING_RULES, bank_amortization_schedule
+from simulateur.cache import cache_stats, clear_caches, memoize
+from simulateur.affordability import affordability_index, affordability_matrix, max_loan
+from simulateur.engine import (
+    INSURANCE_FIXED, INSURANCE_RATE, NOTARY_FEE_RATES, monthly_payment as compute_monthly_payment,
+    total_cost,
+)
+from simulateur.derived import loan_graph
+from simulateur.export import to_bytes
+from simulateur.graph import GraphState
+from simulateur.montecarlo import run_monte_carlo
+from simulateur.project import DEFERRAL_TYPES, loan_line, project_frame, project_schedule, project_summary
+from simulateur.prepayment import MODE_TERM, PREPAYMENT_MODES, lump_sum, recurring_payment, simulate_prepayments
+from simulateur.prepayment_optimizer import OBJECTIVES, optimize_prepayment
+from simulateur.profiling import begin_rerun, end_rerun, instrument, metrics_summary, span
+from simulateur.report import generate_pdf_report
+from simulateur.sensitivity import sensitivity_frame, sensitivity_grid
+from simulateur.store import open_store
+from simulateur.tables import page, page_count, year_months, yearly_summary
+from simulateur.warmup import warm_up
+
+# Tables de calcul partagées préparées en tâche de fond, une fois par processus. plotly et
+# fpdf ne sont importés que par les onglets et téléchargements qui s'en servent.
+warm_up()
+
+# Mesure de la réexécution (allocations suivies si SIMULATEUR_TRACEMALLOC est défini)
+rerun = begin_rerun("Capacite_Emprunt")
 
 # --- Pied de page / Informations version ---
 st.sidebar.markdown("---")
@@ -24,80 +50,64 @@ st.sidebar.caption("🔢 Version : **v1.2.0**")
 st.markdown("---")
 st.caption("🛠️ Développé par **I. Bitar** · 📅 Dernière mise à jour : **15 août 2025** · 🔢 Version : **v1.2.0**")
 
+# Courbe de capacité d'emprunt : mensualité pour chaque montant de prêt (pas en €)
+@instrument()
+@memoize(max_entries=32)
+def borrowing_capacity_curve(interest_rate, years, down_payment, step=10000):
+    loan_amounts = np.arange(150000, 500001, step)
+    monthly_payments = compute_monthly_payment(np.maximum(loan_amounts - down_payment, 0), interest_rate, years)
+    return pd.DataFrame({"Montant du prêt (€)": loan_amounts, "Mensualité du prêt (€)": monthly_payments})
+
 # Fonction pour calculer la capacité d'emprunt
-def plot_borrowing_capacity(interest_rate, years, down_payment):
-    loan_amounts = np.arange(150000, 500001, 10000)
-    months = years * 12
-    monthly_interest_rate = interest_rate / 100 / 12
-
-    monthly_payments = []
-    for loan in loan_amounts:
-        loan -= down_payment
-        if loan <= 0:
-            monthly_payments.append(0)
-        else:
-            payment = loan * (monthly_interest_rate * (1 + monthly_interest_rate) ** months) / \
-                      ((1 + monthly_interest_rate) ** months - 1)
-            monthly_payments.append(payment)
-
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.plot(loan_amounts, monthly_payments, marker='o', linestyle='-', color='b')
-    ax.set_title(f"Capacité d'emprunt\nTaux : {interest_rate:.2f} % | Durée : {years} ans | Apport : {down_payment:,.0f} €")
-    ax.set_xlabel('Montant du prêt (€)')
-    ax.set_ylabel('Mensualité du prêt (€)')
-    ax.grid(True)
+@instrument()
+@memoize(max_entries=32)
+def plot_borrowing_capacity(interest_rate, years, down_payment, step=10000):
+    import plotly.express as px
+
+    curve = borrowing_capacity_curve(interest_rate, years, down_payment, step)
+    high_density = len(curve) > 1000
+    fig = px.line(
+        curve, x="Montant du prêt (€)", y="Mensualité du prêt (€)",
+        markers=not high_density,
+        render_mode="webgl" if high_density else "auto",
+        title=f"Capacité d'emprunt<br>Taux : {interest_rate:.2f} % | Durée : {years} ans | Apport : {down_payment:,.0f} €",
+    )
     return fig
 
-# Fonction pour calculer les revenus requis
-def calculate_income_requirements(monthly_payments, debt_ratio, net_to_gross_ratio):
-    required_monthly_net_incomes = [payment / debt_ratio for payment in monthly_payments]
-    required_annual_net_incomes = [income * 12 for income in required_monthly_net_incomes]
-    required_monthly_gross_incomes = [income / net_to_gross_ratio for income in required_monthly_net_incomes]
-    required_annual_gross_incomes = [income * 12 for income in required_monthly_gross_incomes]
-
-    return {
-        "monthly_net": required_monthly_net_incomes,
-        "annual_net": required_annual_net_incomes,
-        "monthly_gross": required_monthly_gross_incomes,
-        "annual_gross": required_annual_gross_incomes
-    }
-
-# Fonction pour générer le rapport de prêt
-def generate_loan_report(property_value, interest_rate, years, down_payment, debt_ratio,
-                         net_to_gross_ratio, notary_fee_rate, insurance_choice,
-                         insurance_rate, insurance_amount):
-    # Calcul des frais de notaire
-    notary_fees = property_value * notary_fee_rate / 100
-    project_cost = property_value + notary_fees  # Coût total du projet
-    loan_amount = project_cost - down_payment  # Montant à emprunter
-
-    if loan_amount <= 0:
+# Tableau des revenus requis pour une gamme de montants de prêt (une ligne de la matrice d'accessibilité)
+@instrument()
+@memoize()
+def build_income_table(loan_amounts, interest_rate, years, debt_ratio, net_to_gross_ratio):
+    matrix = affordability_matrix(loan_amounts, interest_rate, years, debt_ratio, net_to_gross_ratio)
+    return pd.DataFrame({
+        "Mensualité (€)": matrix["monthly_payment"][:, 0, 0],
+        "Revenu net mensuel (€)": matrix["monthly_net"][:, 0, 0, 0],
+        "Revenu net annuel (€)": matrix["annual_net"][:, 0, 0, 0],
+        "Revenu brut mensuel (€)": matrix["monthly_gross"][:, 0, 0, 0],
+        "Revenu brut annuel (€)": matrix["annual_gross"][:, 0, 0, 0]
+    })
+
+# Fonction pour afficher le rapport de prêt (résultats de loan_report)
+def generate_loan_report(report, property_value, interest_rate, years, down_payment, notary_fee_rate):
+    notary_fees = report["notary_fees"]
+    project_cost = report["project_cost"]  # Coût total du projet
+    loan_amount = report["loan_amount"]  # Montant à emprunter
+
+    if not report["loan_required"]:
         st.write("L'apport couvre ou dépasse le montant total du projet. Aucun prêt requis.")
         return
 
-    months = years * 12
-    monthly_interest_rate = interest_rate / 100 / 12
-    monthly_payment_bank = loan_amount * (monthly_interest_rate * (1 + monthly_interest_rate) ** months) / \
-                          ((1 + monthly_interest_rate) ** months - 1)
+    monthly_payment_bank = report["monthly_payment_bank"]
+    insurance_per_month = report["insurance_per_month"]
+    monthly_payment = report["monthly_payment"]
+    total_paid = report["total_paid"]  # Total payé sur la durée du prêt (avec assurance)
+    total_interest = report["total_interest"]  # Intérêts cumulés
 
-    if insurance_choice == "Taux (%)":
-        insurance_per_month = loan_amount * insurance_rate / 100 / 12
-    elif insurance_choice == "Montant fixe (€)":
-        insurance_per_month = insurance_amount
-    else:
-        insurance_per_month = 0
-
-    monthly_payment = monthly_payment_bank + insurance_per_month
+    required_monthly_net_income = report["required_monthly_net_income"]
+    required_annual_net_income = report["required_annual_net_income"]
+    required_monthly_gross_income = report["required_monthly_gross_income"]
+    required_annual_gross_income = report["required_annual_gross_income"]
 
-    # Calcul du coût total du prêt
-    total_paid = monthly_payment * months  # Total payé sur la durée du prêt (avec assurance)
-    total_interest = (monthly_payment_bank * months) - loan_amount  # Intérêts cumulés
-
-    required_monthly_net_income = monthly_payment / debt_ratio
-    required_annual_net_income = required_monthly_net_income * 12
-    required_monthly_gross_income = required_monthly_net_income / net_to_gross_ratio
-    required_annual_gross_income = required_annual_net_income / net_to_gross_ratio
-    
     # Informations sur le bien
     st.markdown("#### 🏠 Informations sur le bien")
     st.write(f"- **Valeur du bien :** {property_value:.2f} €")
@@ -112,6 +122,7 @@ def generate_loan_report(property_value, interest_rate, years, down_payment, deb
     if insurance_per_month:
         st.write(f"- **Assurance mensuelle :** {insurance_per_month:.2f} €")
     st.write(f"- **Mensualité totale :** {monthly_payment:.2f} €")
+    st.write(f"- **TAEG (frais, garantie et assurance inclus) :** {report['taeg']:.2f} %")
     st.write(
         f"💡 La mensualité a été calculée sur la base d'un taux d'intérêt de **{interest_rate:.2f}%** et d'une durée de prêt de **{years} ans**."
     )
@@ -129,124 +140,113 @@ def generate_loan_report(property_value, interest_rate, years, down_payment, deb
     st.write(f"- **Coût total du prêt (incluant les intérêts) :** {total_paid:.2f} €")
     st.write(f"- **Intérêts totaux sur la durée du prêt :** {total_interest:.2f} €")
 
-# Fonction pour convertir un DataFrame en CSV
-def convert_df_to_csv(df):
-    return df.to_csv(index=False).encode('utf-8')
-
 # Fonction pour générer un tableau d'amortissement
-def generate_amortization_schedule(loan_amount, interest_rate, years, monthly_insurance=0):
-    months = years * 12
-    monthly_rate = interest_rate / 100 / 12
-    payment_bank = loan_amount * (monthly_rate * (1 + monthly_rate) ** months) / ((1 + monthly_rate) ** months - 1)
-    balance = loan_amount
-    schedule = []
-    for m in range(1, months + 1):
-        interest = balance * monthly_rate
-        principal = payment_bank - interest
-        balance -= principal
-        schedule.append({
-            "Mois": m,
-            "Mensualité": payment_bank + monthly_insurance,
-            "Capital": principal,
-            "Intérêt": interest,
-            "Assurance": monthly_insurance,
-            "Solde restant": max(balance, 0)
-        })
-        if balance <= 0:
-            break
-    return pd.DataFrame(schedule)
+@instrument()
+@memoize()
+def generate_amortization_schedule(loan_amount, interest_rate, years, monthly_insurance=0, rounding=None):
+    if rounding is not None:
+        return bank_amortization_schedule(loan_amount, interest_rate, years, monthly_insurance, rounding)
+    return amortization_schedule(loan_amount, interest_rate, years, monthly_insurance)
 
 # Simulation avec remboursement anticipé
-def simulate_prepayment(loan_amount, interest_rate, years, extra_payment, start_month, monthly_insurance=0):
-    months = years * 12
-    monthly_rate = interest_rate / 100 / 12
-    payment_bank = loan_amount * (monthly_rate * (1 + monthly_rate) ** months) / ((1 + monthly_rate) ** months - 1)
-    balance = loan_amount
-    schedule = []
-    m = 1
-    while balance > 0:
-        interest = balance * monthly_rate
-        principal = payment_bank - interest
-        if m >= start_month:
-            principal += extra_payment
-        if principal > balance:
-            principal = balance
-        balance -= principal
-        total_payment = payment_bank + monthly_insurance
-        if m >= start_month:
-            total_payment += extra_payment
-        schedule.append({
-            "Mois": m,
-            "Mensualité": total_payment,
-            "Capital": principal,
-            "Intérêt": interest,
-            "Assurance": monthly_insurance,
-            "Solde restant": max(balance, 0)
-        })
-        m += 1
-        if m > months * 2:
-            break
-    return pd.DataFrame(schedule)
-
-# Fonction pour générer le PDF
-def generate_pdf_report(property_value, interest_rate, years, down_payment, debt_ratio, net_to_gross_ratio, notary_fee_rate,
-                        monthly_payment, loan_amount, total_paid, total_interest, notary_fees, project_cost, insurance_per_month):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-
-    # Titre
-    pdf.set_font("Arial", style="B", size=16)
-    pdf.cell(200, 10, txt="Rapport détaillé - Simulateur de prêt immobilier", ln=True, align="C")
-    pdf.ln(10)
-
-    # Date de génération
-    pdf.set_font("Arial", size=10)
-    current_date = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    pdf.cell(200, 10, txt=f"Date de génération : {current_date}", ln=True, align="R")
-    pdf.ln(10)
-
-    # Hypothèses de l'utilisateur
-    pdf.set_font("Arial", style="B", size=14)
-    pdf.cell(200, 10, txt="Hypothèses retenues :", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"- Valeur du bien : {property_value:.2f} EUR", ln=True)
-    pdf.cell(200, 10, txt=f"- Taux d'intérêt : {interest_rate:.2f}%", ln=True)
-    pdf.cell(200, 10, txt=f"- Durée du prêt : {years} ans", ln=True)
-    pdf.cell(200, 10, txt=f"- Apport initial : {down_payment:.2f} EUR", ln=True)
-    pdf.cell(200, 10, txt=f"- Frais de notaire retenus : {notary_fee_rate:.2f}%", ln=True)
-    pdf.ln(10)
-
-    # Résultats principaux
-    pdf.set_font("Arial", style="B", size=14)
-    pdf.cell(200, 10, txt="Résultats principaux :", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"- Frais de notaire : {notary_fees:.2f} EUR", ln=True)
-    pdf.cell(200, 10, txt=f"- Coût total du projet : {project_cost:.2f} EUR", ln=True)
-    pdf.cell(200, 10, txt=f"- Montant à emprunter : {loan_amount:.2f} EUR", ln=True)
-    pdf.cell(200, 10, txt=f"- Mensualité : {monthly_payment:.2f} EUR", ln=True)
-    if insurance_per_month:
-        pdf.cell(200, 10, txt=f"- Assurance mensuelle : {insurance_per_month:.2f} EUR", ln=True)
-    pdf.ln(10)
-
-    # Revenus requis
-    pdf.set_font("Arial", style="B", size=14)
-    pdf.cell(200, 10, txt="Revenus requis :", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"- Revenu net mensuel requis : {(monthly_payment / debt_ratio):.2f} EUR", ln=True)
-    pdf.cell(200, 10, txt=f"- Revenu brut mensuel requis : {(monthly_payment / debt_ratio / net_to_gross_ratio):.2f} EUR", ln=True)
-    pdf.ln(10)
+@instrument()
+@memoize()
+def simulate_prepayment(loan_amount, interest_rate, years, extra_payment, start_month, monthly_insurance=0,
+                        lump_sum_amount=0, lump_sum_month=1, mode=MODE_TERM, rounding=None):
+    events = []
+    if extra_payment > 0:
+        events.append(recurring_payment(extra_payment, start_month, mode=mode))
+    if lump_sum_amount > 0:
+        events.append(lump_sum(lump_sum_month, lump_sum_amount, mode=mode))
+    return simulate_prepayments(loan_amount, interest_rate, years, events, monthly_insurance, schedule=True,
+                                rounding=rounding)
+
+# Meilleur plan de remboursement anticipé sous budget
+@instrument()
+@memoize(max_entries=32)
+def optimize_prepayment_plan(loan_amount, interest_rate, years, monthly_budget, lump_sum_budget, investment_return,
+                             objective, monthly_insurance=0):
+    return optimize_prepayment(loan_amount, interest_rate, years, monthly_budget, lump_sum_budget, investment_return,
+                               objective, monthly_insurance=monthly_insurance)
+
+# Analyse de sensibilité de la mensualité à ±1 % autour du taux choisi
+@instrument()
+@memoize()
+def compute_sensitivity(loan_amount, interest_rate, years, insurance_per_month):
+    start_rate = max(0.5, interest_rate - 1.0)
+    end_rate = min(10.0, interest_rate + 1.0)
+    interest_rate_range = np.arange(start_rate, end_rate + 0.01, 0.1)
 
-    # Coût total du prêt
-    pdf.set_font("Arial", style="B", size=14)
-    pdf.cell(200, 10, txt="Coût total du prêt :", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"- Coût total du prêt (avec intérêts) : {total_paid:.2f} EUR", ln=True)
-    pdf.cell(200, 10, txt=f"- Intérêts totaux sur la durée du prêt : {total_interest:.2f} EUR", ln=True)
-    pdf.ln(10)
+    sensitivity = total_cost(loan_amount, interest_rate_range, years, insurance_per_month)
+    return pd.DataFrame({
+        "Taux d'intérêt (%)": np.round(interest_rate_range, 2),
+        "Mensualité (€)": sensitivity["monthly_payment_bank"] + insurance_per_month,
+        "Coût total (€)": sensitivity["total_paid"],
+        "Intérêts totaux (€)": sensitivity["total_interest"],
+    })
+
+# Simulation Monte Carlo d'un prêt à taux variable capé (graine fixe : résultats reproductibles)
+@instrument()
+@memoize(max_entries=16)
+def simulate_variable_rate(loan_amount, interest_rate, years, monthly_insurance, model, volatility, cap_margin,
+                           reset_months, n_paths, monthly_income, debt_ratio):
+    return run_monte_carlo(
+        loan_amount, years, interest_rate, n_paths=n_paths, model=model, volatility=volatility,
+        cap=interest_rate + cap_margin, reset_months=reset_months, monthly_insurance=monthly_insurance,
+        monthly_income=monthly_income, debt_ratio=debt_ratio, seed=0,
+    )
 
-    # Retourne le PDF en tant que bytes
-    return pdf.output(dest="S").encode("latin1")
+# Surface de sensibilité taux × durée (5 à 30 ans) × apport
+@instrument()
+@memoize(max_entries=16)
+def compute_sensitivity_surface(project_cost, rate_min, rate_max, rate_step, down_max, down_step,
+                                insurance_choice, insurance_rate, insurance_amount):
+    interest_rates = np.round(np.arange(rate_min, rate_max + rate_step / 2, rate_step), 2)
+    down_payments = np.arange(0, down_max + 1, down_step, dtype=float)
+    return sensitivity_grid(project_cost, interest_rates, np.arange(5, 31), down_payments,
+                            insurance_choice, insurance_rate, insurance_amount)
+
+# Export de la surface complète, produit uniquement au téléchargement
+@instrument()
+@memoize(max_entries=8)
+def export_sensitivity_surface(file_format, *surface_args):
+    return to_bytes(sensitivity_frame(compute_sensitivity_surface(*surface_args)), file_format)
+
+# Montage multi-prêts : synthèse par prêt et échéancier combiné
+@instrument()
+@memoize(max_entries=32)
+def compute_project(lines):
+    schedule = project_schedule(lines)
+    return project_summary(schedule), project_frame(schedule)
+
+# Tableau d'amortissement d'un scénario enregistré, relu depuis le magasin de scénarios
+def scenario_schedule_csv(params):
+    return to_bytes(open_store().result(params, "schedule"), "csv")
+
+# Colonnes numériques : nombres bruts envoyés au navigateur, qui applique le format (pas de Styler)
+def number_columns(columns, number_format="%.2f"):
+    return {column: st.column_config.NumberColumn(format=number_format) for column in columns}
+
+SCHEDULE_FORMATS = number_columns(SCHEDULE_COLUMNS[1:])
+
+# Tableau d'amortissement long : synthèse par année avec détail mensuel d'une année, ou pages
+# de mois ; seules les lignes affichées sont envoyées au navigateur
+def render_schedule(schedule, key):
+    view = st.radio("Affichage", ["Par année", "Par mois"], horizontal=True, key=f"{key}_view",
+                    persist_state="session")
+    if view == "Par année":
+        yearly = yearly_summary(schedule)
+        st.dataframe(yearly, column_config={"Année": st.column_config.NumberColumn(format="%d"), **SCHEDULE_FORMATS},
+                     hide_index=True)
+        year = st.selectbox("Détail mensuel de l'année", yearly["Année"].tolist(), index=None,
+                            placeholder="Choisir une année", key=f"{key}_year", persist_state="session")
+        if year is not None:
+            st.dataframe(year_months(schedule, year), column_config=SCHEDULE_FORMATS, hide_index=True)
+    else:
+        pages = page_count(len(schedule))
+        number = st.number_input(f"Page (sur {pages})", min_value=1, max_value=pages, value=1, step=1,
+                                 key=f"{key}_page", persist_state="session")
+        st.dataframe(page(schedule, number), column_config=SCHEDULE_FORMATS, hide_index=True)
 
 # Validation des entrées utilisateur
 st.sidebar.header("Paramètres")
@@ -257,7 +257,7 @@ property_value = st.sidebar.number_input("Valeur du bien (€)", min_value=10000
 
 # Choix du type de bien
 property_type = st.sidebar.radio("Type de bien :", ["Ancien", "Neuf"])
-notary_fee_rate = 7 if property_type == "Ancien" else 1
+notary_fee_rate = NOTARY_FEE_RATES[property_type]
 
 # Permettre à l'utilisateur de personnaliser les frais de notaire
 notary_fee_rate = st.sidebar.slider(
@@ -284,254 +284,613 @@ else:
     insurance_rate = 0.0
     insurance_amount = 0.0
 
+# Frais pris en compte dans le TAEG
+bank_fees = st.sidebar.number_input("Frais de dossier (€)", min_value=0.0, value=0.0, step=100.0)
+guarantee_fees = st.sidebar.number_input("Frais de garantie (caution ou hypothèque) (€)", min_value=0.0, value=0.0, step=100.0)
+
 # Validation pour éviter les incohérences
 if property_value <= down_payment:
     st.error("L'apport initial ne peut pas être supérieur ou égal à la valeur du bien.")
+    end_rerun(rerun)
     st.stop()
 
+# État dérivé des paramètres : graphe de dépendances évalué à la demande et partagé par tous
+# les onglets. D'une exécution à l'autre de la session, seuls les nœuds dont une entrée a
+# changé sont recalculés (le ratio net/brut ne touche que les revenus bruts).
+derived_graph = loan_graph()
+derived_graph.node("loan_amount", "interest_rate", "years", "insurance_per_month", "rounding",
+                   name="amortization_schedule")(generate_amortization_schedule)
+derived_graph.node("loan_amount", "interest_rate", "years", "insurance_per_month",
+                   name="sensitivity")(compute_sensitivity)
+report = derived_graph.evaluate(
+    st.session_state.setdefault("derived_values", GraphState()),
+    property_value=float(property_value), interest_rate=interest_rate, years=years, down_payment=float(down_payment),
+    debt_ratio=debt_ratio, net_to_gross_ratio=net_to_gross_ratio, notary_fee_rate=notary_fee_rate,
+    insurance_choice=insurance_choice, insurance_rate=insurance_rate, insurance_amount=insurance_amount,
+    bank_fees=bank_fees, guarantee_fees=guarantee_fees,
+)
+notary_fees = report["notary_fees"]
+project_cost = report["project_cost"]
+loan_amount = report["loan_amount"]
+insurance_per_month = report["insurance_per_month"]
+monthly_payment = report["monthly_payment"]
+
 st.title("Simulateur de prêt immobilier")
 
-# Affichage des onglets
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
+# Affichage des onglets : seul l'onglet ouvert est calculé et rendu (changer d'onglet relance
+# le script). Les widgets des onglets conservent leur valeur pendant qu'ils sont masqués.
+tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
     "Rapport détaillé",
     "Capacité d'emprunt",
     "Revenu requis",
     "Tableau d'amortissement",
     "Analyse de sensibilité",
-])
+    "Montage multi-prêts",
+    "Scénarios",
+], key="section", on_change="rerun")
 
 # Ajout du bouton de téléchargement dans le rapport détaillé
-with tab1:
-    st.subheader("Rapport détaillé")
-    st.write("""
-    Ce rapport fournit une vue d'ensemble détaillée des exigences de revenu, des mensualités, et du coût total du projet immobilier.
-    """)
-    generate_loan_report(
-        property_value, interest_rate, years, down_payment, debt_ratio,
-        net_to_gross_ratio, notary_fee_rate, insurance_choice, insurance_rate,
-        insurance_amount
-    )
+if tab1.open:
+    with tab1, span("Rapport détaillé"):
+        st.subheader("Rapport détaillé")
+        st.write("""
+        Ce rapport fournit une vue d'ensemble détaillée des exigences de revenu, des mensualités, et du coût total du projet immobilier.
+        """)
+        generate_loan_report(report, property_value, interest_rate, years, down_payment, notary_fee_rate)
+
+        # Le PDF n'est rendu qu'au clic sur le bouton de téléchargement
+        pdf_data = partial(
+            generate_pdf_report,
+            property_value, interest_rate, years, down_payment, debt_ratio, net_to_gross_ratio,
+            notary_fee_rate, monthly_payment, loan_amount, float(report["total_paid"]), float(report["total_interest"]),
+            notary_fees, project_cost, insurance_per_month, float(report["taeg"])
+        )
 
-    # Génération et téléchargement du PDF
-    notary_fees = property_value * notary_fee_rate / 100
-    project_cost = property_value + notary_fees
-    loan_amount = project_cost - down_payment
-    monthly_interest_rate = interest_rate / 100 / 12
-    months = years * 12
-    monthly_payment_bank = loan_amount * (monthly_interest_rate * (1 + monthly_interest_rate) ** months) / \
-                          ((1 + monthly_interest_rate) ** months - 1)
-    if insurance_choice == "Taux (%)":
-        insurance_per_month = loan_amount * insurance_rate / 100 / 12
-    elif insurance_choice == "Montant fixe (€)":
-        insurance_per_month = insurance_amount
-    else:
-        insurance_per_month = 0
-    monthly_payment = monthly_payment_bank + insurance_per_month
-    total_paid = monthly_payment * months
-    total_interest = (monthly_payment_bank * months) - loan_amount
-
-    pdf_data = generate_pdf_report(
-        property_value, interest_rate, years, down_payment, debt_ratio, net_to_gross_ratio, 
-        notary_fee_rate, monthly_payment, loan_amount, total_paid, total_interest,
-        notary_fees, project_cost, insurance_per_month
-    )
+        # Bouton de téléchargement
+        st.download_button(
+            label="Télécharger le rapport en PDF 📄",
+            data=pdf_data,
+            file_name="rapport_pret_immobilier.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+        )
+if tab2.open:
+    with tab2, span("Capacité d'emprunt"):
+        st.subheader("Capacité d'emprunt")
+        st.write("""
+        Ce graphique montre comment la mensualité varie en fonction du montant du prêt demandé. 
+        Vous pouvez ajuster le taux d'intérêt, la durée et l'apport initial pour voir l'impact sur les mensualités.
+        """)
+        st.markdown("### 💡 Simulation rapide de mensualité")
+
+        selected_loan = st.slider(
+            "Choisissez un montant de prêt pour simuler la mensualité associée :",
+            min_value=150000,
+            max_value=500000,
+            step=10000,
+            value=300000,
+            key="selected_loan",
+            persist_state="session",
+        )
 
-    # Bouton de téléchargement
-    st.download_button(
-        label="Télécharger le rapport en PDF 📄",
-        data=pdf_data,
-        file_name="rapport_pret_immobilier.pdf",
-        mime="application/pdf",
-    )
-with tab2:
-    st.subheader("Capacité d'emprunt")
-    st.write("""
-    Ce graphique montre comment la mensualité varie en fonction du montant du prêt demandé. 
-    Vous pouvez ajuster le taux d'intérêt, la durée et l'apport initial pour voir l'impact sur les mensualités.
-    """)
-    st.markdown("### 💡 Simulation rapide de mensualité")
-
-    selected_loan = st.slider(
-        "Choisissez un montant de prêt pour simuler la mensualité associée :",
-        min_value=150000,
-        max_value=500000,
-        step=10000,
-        value=300000
-    )
+        loan_net = selected_loan - down_payment
+        if loan_net <= 0:
+            st.warning("L'apport couvre ou dépasse le montant du prêt sélectionné.")
+        else:
+            selected_payment = compute_monthly_payment(loan_net, interest_rate, years)
+            st.metric("Mensualité estimée", f"{selected_payment:,.2f} €", help=f"Pour un emprunt de {selected_loan} €")
+            
+        high_density = st.toggle("Mode haute résolution (pas de 100 €)", value=False, key="high_density",
+                                 persist_state="session")
+        st.plotly_chart(
+            plot_borrowing_capacity(interest_rate, years, down_payment, 100 if high_density else 10000),
+            use_container_width=True,
+        )
 
-    loan_net = selected_loan - down_payment
-    if loan_net <= 0:
-        st.warning("L'apport couvre ou dépasse le montant du prêt sélectionné.")
-    else:
-        months = years * 12
-        monthly_interest_rate = interest_rate / 100 / 12
-        monthly_payment = loan_net * (monthly_interest_rate * (1 + monthly_interest_rate) ** months) / \
-                          ((1 + monthly_interest_rate) ** months - 1)
-        st.metric("Mensualité estimée", f"{monthly_payment:,.2f} €", help=f"Pour un emprunt de {selected_loan} €")
-        
-    st.pyplot(plot_borrowing_capacity(interest_rate, years, down_payment))
-
-with tab3:
-    st.subheader("Revenus requis")
-    st.write("""
-    Cet onglet vous permet de visualiser les revenus nécessaires pour couvrir différentes mensualités.
-    Les mensualités sont ajustées en fonction des paramètres que vous avez définis.
-    """)
-
-    # Recalcul des mensualités en fonction du montant du prêt minimum et maximum
-    loan_amounts = np.arange(150000, 500001, 10000)
-    months = years * 12
-    monthly_interest_rate = interest_rate / 100 / 12
-    monthly_payments = [
-        loan * (monthly_interest_rate * (1 + monthly_interest_rate) ** months) /
-        ((1 + monthly_interest_rate) ** months - 1)
-        for loan in loan_amounts
-    ]
-
-    # Calcul des revenus requis
-    income_data = calculate_income_requirements(monthly_payments, debt_ratio, net_to_gross_ratio)
-
-    # Sélection du graphique
-    option = st.radio(
-        "Choisissez le type de revenu à visualiser :",
-        ("Revenu net mensuel", "Revenu net annuel", "Revenu brut mensuel", "Revenu brut annuel")
-    )
+if tab3.open:
+    with tab3, span("Revenu requis"):
+        import plotly.express as px
+
+        st.subheader("Revenus requis")
+        st.write("""
+        Cet onglet vous permet de visualiser les revenus nécessaires pour couvrir différentes mensualités.
+        Les mensualités sont ajustées en fonction des paramètres que vous avez définis.
+        """)
+
+        # Recalcul des mensualités et des revenus requis en fonction du montant du prêt minimum et maximum
+        loan_amounts = np.arange(150000, 500001, 10000)
+        df = build_income_table(loan_amounts, interest_rate, years, debt_ratio, net_to_gross_ratio)
+
+        # Sélection du graphique
+        option = st.radio(
+            "Choisissez le type de revenu à visualiser :",
+            ("Revenu net mensuel", "Revenu net annuel", "Revenu brut mensuel", "Revenu brut annuel"),
+            key="income_view",
+            persist_state="session",
+        )
 
-    # Génération des graphiques interactifs
-    if option == "Revenu net mensuel":
-        fig = px.line(
-            x=loan_amounts, y=income_data['monthly_net'],
-            labels={"x": "Montant du prêt (€)", "y": "Revenu net mensuel (€)"},
-            title="Revenu net mensuel nécessaire pour chaque montant de prêt"
+        # Génération des graphiques interactifs
+        if option == "Revenu net mensuel":
+            fig = px.line(
+                x=loan_amounts, y=df["Revenu net mensuel (€)"],
+                labels={"x": "Montant du prêt (€)", "y": "Revenu net mensuel (€)"},
+                title="Revenu net mensuel nécessaire pour chaque montant de prêt"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        elif option == "Revenu net annuel":
+            fig = px.line(
+                x=loan_amounts, y=df["Revenu net annuel (€)"],
+                labels={"x": "Montant du prêt (€)", "y": "Revenu net annuel (€)"},
+                title="Revenu net annuel nécessaire pour chaque montant de prêt"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        elif option == "Revenu brut mensuel":
+            fig = px.line(
+                x=loan_amounts, y=df["Revenu brut mensuel (€)"],
+                labels={"x": "Montant du prêt (€)", "y": "Revenu brut mensuel (€)"},
+                title="Revenu brut mensuel nécessaire pour chaque montant de prêt"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        elif option == "Revenu brut annuel":
+            fig = px.line(
+                x=loan_amounts, y=df["Revenu brut annuel (€)"],
+                labels={"x": "Montant du prêt (€)", "y": "Revenu brut annuel (€)"},
+                title="Revenu brut annuel nécessaire pour chaque montant de prêt"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+        # Tableau récapitulatif
+        st.write("### Tableau récapitulatif des revenus requis")
+        st.dataframe(df, column_config={
+            "Mensualité (€)": st.column_config.NumberColumn(format="%.0f"),
+            **number_columns(["Revenu net mensuel (€)", "Revenu net annuel (€)", "Revenu brut mensuel (€)",
+                              "Revenu brut annuel (€)"]),
+        })
+
+        # Bouton de téléchargement
+        st.download_button(
+            label="Télécharger le tableau au format CSV",
+            data=partial(to_bytes, df, "csv"),
+            file_name="revenus_requis.csv",
+            mime='text/csv',
+            on_click="ignore",
         )
-        st.plotly_chart(fig, use_container_width=True)
-    elif option == "Revenu net annuel":
-        fig = px.line(
-            x=loan_amounts, y=income_data['annual_net'],
-            labels={"x": "Montant du prêt (€)", "y": "Revenu net annuel (€)"},
-            title="Revenu net annuel nécessaire pour chaque montant de prêt"
+
+        # Recherche inverse : lecture de l'index précalculé, sans recalcul des mensualités
+        st.markdown("### Prêt maximal pour un revenu donné")
+        col1, col2 = st.columns(2)
+        affordability_income = col1.number_input("Revenu net mensuel (€)", min_value=0.0, value=4000.0, step=100.0,
+                                                 key="affordability_income", persist_state="session")
+        existing_debts = col1.number_input("Crédits en cours (€ par mois)", min_value=0.0, value=0.0, step=50.0,
+                                           key="existing_debts", persist_state="session")
+        index = affordability_index(insurance_rate=insurance_rate if insurance_choice == INSURANCE_RATE else 0.0)
+        fixed_insurance = insurance_amount if insurance_choice == INSURANCE_FIXED else 0.0
+        col2.metric(
+            "Prêt maximal",
+            f"{max_loan(index, affordability_income, interest_rate, years, debt_ratio, existing_debts, fixed_insurance):,.0f} €",
+            help=f"Taux {interest_rate:.2f} %, {years} ans, endettement {debt_ratio:.0%}, assurance comprise",
         )
-        st.plotly_chart(fig, use_container_width=True)
-    elif option == "Revenu brut mensuel":
-        fig = px.line(
-            x=loan_amounts, y=income_data['monthly_gross'],
-            labels={"x": "Montant du prêt (€)", "y": "Revenu brut mensuel (€)"},
-            title="Revenu brut mensuel nécessaire pour chaque montant de prêt"
+        max_loan_terms = np.arange(10, 31, 5)
+        max_loan_ratios = np.array([0.30, 0.33, 0.35, 0.40])
+        max_loans = max_loan(index, affordability_income, interest_rate, max_loan_terms[:, np.newaxis], max_loan_ratios,
+                             existing_debts, fixed_insurance)
+        st.dataframe(
+            pd.DataFrame(max_loans.round(0), index=pd.Index(max_loan_terms, name="Durée (années)"),
+                         columns=[f"Endettement {ratio:.0%}" for ratio in max_loan_ratios]),
         )
-        st.plotly_chart(fig, use_container_width=True)
-    elif option == "Revenu brut annuel":
-        fig = px.line(
-            x=loan_amounts, y=income_data['annual_gross'],
-            labels={"x": "Montant du prêt (€)", "y": "Revenu brut annuel (€)"},
-            title="Revenu brut annuel nécessaire pour chaque montant de prêt"
+
+if tab4.open:
+    with tab4, span("Tableau d'amortissement"):
+        st.subheader("Tableau d'amortissement")
+        col1, col2 = st.columns(2)
+        bank_exact = col1.toggle("Arrondi bancaire au centime", key="bank_exact", persist_state="session",
+                                 help="Mensualité et intérêts arrondis au centime chaque mois, dernière échéance ajustée, "
+                                      "comme dans une offre de prêt.")
+        rounding_rule = col2.selectbox("Règle d'arrondi", ROUNDING_RULES, index=ROUNDING_RULES.index(ROUND_HALF_UP),
+                                       format_func=str.capitalize, disabled=not bank_exact, key="rounding_rule",
+                                       persist_state="session")
+        report.provide(rounding=rounding_rule if bank_exact else None)
+        amort_table = report["amortization_schedule"]
+        with span("Affichage de l'amortissement"):
+            render_schedule(amort_table, "schedule")
+        st.download_button(
+            label="Télécharger l'amortissement CSV",
+            data=partial(to_bytes, amort_table, "csv"),
+            file_name="amortissement.csv",
+            mime='text/csv',
+            on_click="ignore",
         )
-        st.plotly_chart(fig, use_container_width=True)
 
-    # Tableau récapitulatif
-    data = {
-        "Mensualité (€)": monthly_payments,
-        "Revenu net mensuel (€)": income_data['monthly_net'],
-        "Revenu net annuel (€)": income_data['annual_net'],
-        "Revenu brut mensuel (€)": income_data['monthly_gross'],
-        "Revenu brut annuel (€)": income_data['annual_gross']
-    }
-    df = pd.DataFrame(data)
-
-    st.write("### Tableau récapitulatif des revenus requis")
-    st.dataframe(df.style.format({
-        "Mensualité (€)": "{:.0f}",
-        "Revenu net mensuel (€)": "{:.2f}",
-        "Revenu net annuel (€)": "{:.2f}",
-        "Revenu brut mensuel (€)": "{:.2f}",
-        "Revenu brut annuel (€)": "{:.2f}"
-    }))
-
-    # Bouton de téléchargement
-    csv = convert_df_to_csv(df)
-    st.download_button(
-        label="Télécharger le tableau au format CSV",
-        data=csv,
-        file_name="revenus_requis.csv",
-        mime='text/csv',
-    )
+        st.markdown("### Simulation de remboursement anticipé")
+        col1, col2, col3 = st.columns(3)
+        extra_payment = col1.number_input("Versement complémentaire mensuel (€)", min_value=0.0, value=0.0, step=100.0,
+                                          key="extra_payment", persist_state="session")
+        start_month = col1.number_input("Mois de début", min_value=1, max_value=years * 12, value=1, step=1,
+                                        key="start_month", persist_state="session")
+        lump_sum_amount = col2.number_input("Versement ponctuel (€)", min_value=0.0, value=0.0, step=1000.0,
+                                            key="lump_sum_amount", persist_state="session")
+        lump_sum_month = col2.number_input("Mois du versement ponctuel", min_value=1, max_value=years * 12, value=12, step=1,
+                                           key="lump_sum_month", persist_state="session")
+        prepayment_mode = col3.radio("Après chaque versement, réduire", PREPAYMENT_MODES, format_func=str.capitalize,
+                                     key="prepayment_mode", persist_state="session")
+        if extra_payment > 0 or lump_sum_amount > 0:
+            prepayment = simulate_prepayment(loan_amount, interest_rate, years, extra_payment, int(start_month),
+                                             insurance_per_month, lump_sum_amount, int(lump_sum_month), prepayment_mode,
+                                             report["rounding"])
+            new_schedule = prepayment["schedule"]
+            st.write(f"Durée restante : {prepayment['months']} mois ({prepayment['months_saved']} mois gagnés)")
+            st.write(f"Intérêts économisés : {prepayment['interest_saved']:,.2f} €")
+            st.write(f"Mensualité finale (hors assurance et versements) : {prepayment['final_payment']:,.2f} €")
+            render_schedule(new_schedule, "prepayment_schedule")
+
+        st.markdown("### Optimisation des remboursements anticipés")
+        with st.form("prepayment_optimizer"):
+            col1, col2, col3 = st.columns(3)
+            monthly_budget = col1.number_input("Budget mensuel disponible (€)", min_value=0.0, value=200.0, step=50.0,
+                                               key="monthly_budget", persist_state="session")
+            lump_sum_budget = col1.number_input("Enveloppe de versement ponctuel (€)", min_value=0.0, value=0.0, step=1000.0,
+                                                key="lump_sum_budget", persist_state="session")
+            investment_return = col2.number_input("Rendement d'un placement alternatif (% par an)", min_value=0.0, value=3.0, step=0.5,
+                                                  key="investment_return", persist_state="session")
+            objective = col3.radio("Objectif", OBJECTIVES, format_func=lambda o: "Minimiser les intérêts" if o == "interest" else "Maximiser le patrimoine net",
+                                   key="objective", persist_state="session")
+            optimize = st.form_submit_button("Chercher le meilleur plan")
+        if optimize:
+            best_plan = optimize_prepayment_plan(loan_amount, interest_rate, years, monthly_budget, lump_sum_budget,
+                                                 investment_return, objective, insurance_per_month)
+            if not best_plan["events"]:
+                if monthly_budget == 0 and lump_sum_budget == 0:
+                    reason = "aucun budget n'est disponible"
+                elif objective == "interest":
+                    reason = "il ne réduirait pas les intérêts du prêt"
+                else:
+                    reason = "le placement alternatif est plus intéressant"
+                st.write(f"Aucun remboursement anticipé : {reason}.")
+            for event in best_plan["events"]:
+                if event["end"] is None:
+                    st.write(f"- Versement mensuel de {event['amount']:,.2f} € à partir du mois {event['start']}")
+                else:
+                    st.write(f"- Versement ponctuel de {event['amount']:,.2f} € au mois {event['start']}")
+            mode_advice = f"Après chaque versement, réduire la **{best_plan['mode']}** · " if best_plan["mode"] else ""
+            st.write(f"{mode_advice}durée : {best_plan['months']} mois ({best_plan['months_saved']} mois gagnés) · "
+                     f"intérêts économisés : {best_plan['interest_saved']:,.2f} € · "
+                     f"gain de patrimoine net : {best_plan['net_worth_gain']:,.2f} €")
+            st.caption(f"{best_plan['evaluated']} plans évalués.")
+
+        # Simulation lancée à la demande : des milliers de trajectoires, pas à chaque ouverture de l'onglet
+        st.markdown("### Taux variable : simulation Monte Carlo")
+        with st.form("variable_rate_simulation"):
+            col1, col2, col3 = st.columns(3)
+            rate_model = col1.selectbox("Modèle de taux", ["vasicek", "cir"], format_func=str.upper,
+                                        key="rate_model", persist_state="session")
+            rate_volatility = col1.number_input("Volatilité annuelle du taux (points de %)", min_value=0.0, value=0.5, step=0.1,
+                                                key="rate_volatility", persist_state="session")
+            cap_margin = col2.number_input("Plafond au-dessus du taux initial (points de %)", min_value=0.0, value=1.0, step=0.5,
+                                           key="cap_margin", persist_state="session")
+            reset_months = col2.selectbox("Révision du taux", [12, 1], format_func=lambda m: "Annuelle" if m == 12 else "Mensuelle",
+                                          key="reset_months", persist_state="session")
+            n_paths = col3.select_slider("Nombre de trajectoires", options=[1_000, 10_000, 100_000], value=10_000,
+                                         key="n_paths", persist_state="session")
+            monthly_income = col3.number_input(
+                "Revenu net mensuel de l'emprunteur (€)", min_value=1.0,
+                value=float(np.ceil(monthly_payment / debt_ratio)),
+                step=100.0, key="monthly_income", persist_state="session",
+            )
+            simulate = st.form_submit_button("Lancer la simulation")
+        if simulate:
+            stress = simulate_variable_rate(loan_amount, interest_rate, years, insurance_per_month, rate_model, rate_volatility,
+                                            cap_margin, reset_months, n_paths, monthly_income, debt_ratio)
+            percentiles = stress["percentiles"]
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Probabilité de dépasser le taux d'endettement", f"{stress['breach_probability']:.1%}")
+            col2.metric("Intérêts totaux médians", f"{stress['total_interest'][percentiles.index(50)]:,.0f} €")
+            col3.metric(f"Mensualité maximale (P{percentiles[-1]})", f"{stress['max_payment'][-1]:,.0f} €")
+
+            months_axis = np.arange(1, stress["months"] + 1)
+            import plotly.graph_objects as go
+
+            fig = go.Figure()
+            for band, percentile in zip(stress["payment_bands"], percentiles):
+                fig.add_trace(go.Scatter(x=months_axis, y=band, mode="lines", name=f"P{percentile}"))
+            fig.add_hline(y=debt_ratio * monthly_income, line_dash="dash", annotation_text="Seuil d'endettement")
+            fig.update_layout(title="Mensualité (assurance incluse) par percentile", xaxis_title="Mois", yaxis_title="Mensualité (€)")
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.dataframe(pd.DataFrame({
+                "Percentile": [f"P{percentile}" for percentile in percentiles],
+                "Intérêts totaux (€)": stress["total_interest"],
+                "Mensualité maximale (€)": stress["max_payment"],
+            }), hide_index=True)
+
+if tab5.open:
+    with tab5, span("Analyse de sensibilité"):
+        import plotly.express as px
+        import plotly.graph_objects as go
+
+        st.subheader("Analyse de sensibilité")
+        st.write("""
+        Explorez l'impact des variations de taux d'intérêt sur les mensualités.=:= 
+        Ce graphique montre comment les mensualités évoluent en fonction des taux d'intérêt.
+        """)
+
+        df_sens = report["sensitivity"]
+        st.dataframe(df_sens, column_config=number_columns(df_sens.columns))
+
+        fig = px.line(df_sens, x="Taux d'intérêt (%)", y="Mensualité (€)",
+                      labels={"Taux d'intérêt (%)": "Taux d'intérêt (%)", "Mensualité (€)": "Mensualité (€)"},
+                      title="Analyse de sensibilité des mensualités selon le taux d'intérêt")
+        st.plotly_chart(fig, use_container_width=True)
 
-with tab4:
-    st.subheader("Tableau d'amortissement")
-    amort_table = generate_amortization_schedule(loan_amount, interest_rate, years, insurance_per_month)
-    st.dataframe(amort_table.style.format({
-        "Mensualité": "{:.2f}",
-        "Capital": "{:.2f}",
-        "Intérêt": "{:.2f}",
-        "Assurance": "{:.2f}",
-        "Solde restant": "{:.2f}",
-    }))
-    csv_amort = convert_df_to_csv(amort_table)
-    st.download_button(
-        label="Télécharger l'amortissement CSV",
-        data=csv_amort,
-        file_name="amortissement.csv",
-        mime='text/csv',
-    )
+        st.download_button(
+            label="Télécharger l'analyse CSV",
+            data=partial(to_bytes, df_sens, "csv"),
+            file_name="analyse_sensibilite.csv",
+            mime='text/csv',
+            on_click="ignore",
+        )
 
-    st.markdown("### Simulation de remboursement anticipé")
-    extra_payment = st.number_input("Versement complémentaire mensuel (€)", min_value=0.0, value=0.0, step=100.0)
-    start_month = st.number_input("Mois de début", min_value=1, value=1, step=1)
-    if extra_payment > 0:
-        new_schedule = simulate_prepayment(loan_amount, interest_rate, years, extra_payment, int(start_month), insurance_per_month)
-        st.write(f"Durée restante : {len(new_schedule)} mois")
-        st.dataframe(new_schedule.style.format({
-            "Mensualité": "{:.2f}",
-            "Capital": "{:.2f}",
-            "Intérêt": "{:.2f}",
-            "Assurance": "{:.2f}",
-            "Solde restant": "{:.2f}",
-        }))
-
-with tab5:
-    st.subheader("Analyse de sensibilité")
-    st.write("""
-    Explorez l'impact des variations de taux d'intérêt sur les mensualités.=:= 
-    Ce graphique montre comment les mensualités évoluent en fonction des taux d'intérêt.
-    """)
+        st.markdown("### Surface de sensibilité (taux × durée × apport)")
+        col1, col2, col3 = st.columns(3)
+        rate_min, rate_max = col1.slider("Plage de taux (%)", min_value=0.5, max_value=10.0, value=(0.5, 10.0), step=0.1,
+                                         key="rate_range", persist_state="session")
+        rate_step = col1.select_slider("Pas de taux (%)", options=[0.01, 0.05, 0.1, 0.25, 0.5], value=0.05,
+                                       key="rate_step", persist_state="session")
+        down_max = col2.number_input("Apport maximal (€)", min_value=0, value=int(project_cost // 10000 * 10000), step=10000,
+                                     key="down_max", persist_state="session")
+        down_step = col2.number_input("Pas d'apport (€)", min_value=1000, value=5000, step=1000,
+                                      key="down_step", persist_state="session")
+        surface_metric = col3.radio("Indicateur", ["Mensualité (€)", "Coût total (€)", "Intérêts totaux (€)"],
+                                    key="surface_metric", persist_state="session")
+
+        surface_args = (project_cost, rate_min, rate_max, rate_step, down_max, down_step,
+                        insurance_choice, insurance_rate, insurance_amount)
+        surface = compute_sensitivity_surface(*surface_args)
+        metric_key = {
+            "Mensualité (€)": "monthly_payment",
+            "Coût total (€)": "total_paid",
+            "Intérêts totaux (€)": "total_interest",
+        }[surface_metric]
+        st.caption(f"{surface[metric_key].size:,} combinaisons calculées")
+
+        down_options = surface["down_payment"].tolist()
+        selected_down = col3.select_slider(
+            "Apport affiché (€)", options=down_options,
+            value=min(down_options, key=lambda value: abs(value - down_payment)),
+            format_func=lambda value: f"{value:,.0f}",
+            key="selected_down", persist_state="session",
+        )
+        values = surface[metric_key][:, :, down_options.index(selected_down)]
 
-    start_rate = max(0.5, interest_rate - 1.0)
-    end_rate = min(10.0, interest_rate + 1.0)
-    interest_rate_range = np.arange(start_rate, end_rate + 0.01, 0.1)
+        fig = px.imshow(
+            values, x=surface["years"], y=surface["interest_rate"], origin="lower", aspect="auto",
+            labels={"x": "Durée (années)", "y": "Taux d'intérêt (%)", "color": surface_metric},
+            title=f"{surface_metric} pour un apport de {selected_down:,.0f} €",
+        )
+        st.plotly_chart(fig, use_container_width=True)
 
-    loan_amount = property_value + property_value * notary_fee_rate / 100 - down_payment
-    months = years * 12
-
-    data = []
-    for rate in interest_rate_range:
-        monthly_rate = rate / 100 / 12
-        payment_bank = loan_amount * (monthly_rate * (1 + monthly_rate) ** months) / ((1 + monthly_rate) ** months - 1)
-        monthly_payment = payment_bank + insurance_per_month
-        total_cost = monthly_payment * months
-        total_interest = (payment_bank * months) - loan_amount
-        data.append({
-            "Taux d'intérêt (%)": round(rate, 2),
-            "Mensualité (€)": monthly_payment,
-            "Coût total (€)": total_cost,
-            "Intérêts totaux (€)": total_interest
-        })
+        fig = go.Figure(go.Surface(z=values, x=surface["years"], y=surface["interest_rate"]))
+        fig.update_layout(
+            title=f"{surface_metric} selon le taux et la durée",
+            scene={"xaxis_title": "Durée (années)", "yaxis_title": "Taux d'intérêt (%)", "zaxis_title": surface_metric},
+            height=600,
+        )
+        st.plotly_chart(fig, use_container_width=True)
 
-    df_sens = pd.DataFrame(data)
-    st.dataframe(df_sens.style.format({
-        "Taux d'intérêt (%)": "{:.2f}",
-        "Mensualité (€)": "{:.2f}",
-        "Coût total (€)": "{:.2f}",
-        "Intérêts totaux (€)": "{:.2f}"
-    }))
-
-    fig = px.line(df_sens, x="Taux d'intérêt (%)", y="Mensualité (€)",
-                  labels={"Taux d'intérêt (%)": "Taux d'intérêt (%)", "Mensualité (€)": "Mensualité (€)"},
-                  title="Analyse de sensibilité des mensualités selon le taux d'intérêt")
-    st.plotly_chart(fig, use_container_width=True)
-
-    csv_sens = convert_df_to_csv(df_sens)
-    st.download_button(
-        label="Télécharger l'analyse CSV",
-        data=csv_sens,
-        file_name="analyse_sensibilite.csv",
-        mime='text/csv'
-    )
+        col1, col2 = st.columns(2)
+        col1.download_button(
+            label="Télécharger la surface CSV",
+            data=partial(export_sensitivity_surface, "csv", *surface_args),
+            file_name="surface_sensibilite.csv",
+            mime='text/csv',
+            on_click="ignore",
+        )
+        if find_spec("pyarrow") is not None:
+            col2.download_button(
+                label="Télécharger la surface Parquet",
+                data=partial(export_sensitivity_surface, "parquet", *surface_args),
+                file_name="surface_sensibilite.parquet",
+                mime="application/vnd.apache.parquet",
+                on_click="ignore",
+            )
+
+if tab6.open:
+    with tab6, span("Montage multi-prêts"):
+        st.subheader("Montage multi-prêts")
+        st.write("""
+        Combinez le prêt principal avec des prêts complémentaires (PTZ, prêt Action Logement...).
+        Le prêt principal finance le reste du projet ; avec le lissage, ses échéances s'adaptent
+        pour que la mensualité totale reste constante.
+        """)
+        # Les modifications de l'éditeur sont perdues quand l'onglet est masqué : le tableau modifié
+        # est conservé et sert de point de départ au retour sur l'onglet (voir plus bas)
+        base_loans = st.session_state.get("project_loans_base")
+        if base_loans is None:
+            base_loans = pd.DataFrame({
+                "Prêt": ["PTZ", "Action Logement"],
+                "Montant (€)": [0.0, 0.0],
+                "Taux (%)": [0.0, 1.0],
+                "Durée (années)": [20, 20],
+                "Différé (mois)": [0, 0],
+                "Type de différé": [DEFERRAL_TYPES[0], DEFERRAL_TYPES[0]],
+            })
+        other_loans = st.data_editor(
+            base_loans,
+            num_rows="dynamic",
+            column_config={
+                "Montant (€)": st.column_config.NumberColumn(min_value=0.0, step=1000.0),
+                "Taux (%)": st.column_config.NumberColumn(min_value=0.0, max_value=10.0, step=0.1),
+                "Durée (années)": st.column_config.NumberColumn(min_value=1, max_value=30, step=1),
+                "Différé (mois)": st.column_config.NumberColumn(min_value=0, max_value=300, step=1),
+                "Type de différé": st.column_config.SelectboxColumn(options=DEFERRAL_TYPES),
+            },
+            key="project_loans",
+        )
+        st.session_state["project_loans_edited"] = other_loans
+        # Lignes ajoutées dans l'éditeur : cellules vides (NaN) remplacées par les valeurs par défaut
+        other_loans = other_loans.dropna(subset=["Montant (€)", "Durée (années)"]).fillna(
+            {"Prêt": "", "Taux (%)": 0.0, "Différé (mois)": 0, "Type de différé": DEFERRAL_TYPES[0]})
+        other_loans = other_loans[other_loans["Montant (€)"] > 0]
+        main_amount = loan_amount - other_loans["Montant (€)"].sum()
+        smoothing = st.checkbox("Lisser la mensualité totale", value=True, key="smoothing", persist_state="session")
+
+        if main_amount <= 0:
+            st.error("Les prêts complémentaires couvrent déjà tout le projet : réduisez leurs montants.")
+        else:
+            lines = [loan_line("Principal", main_amount, interest_rate, years, monthly_insurance=insurance_per_month,
+                               smoothed=smoothing)]
+            lines += [
+                loan_line(row["Prêt"] or f"Prêt {index + 2}", row["Montant (€)"], row["Taux (%)"],
+                          int(row["Durée (années)"]), int(row["Différé (mois)"]), row["Type de différé"])
+                for index, row in enumerate(other_loans.to_dict("records"))
+            ]
+            try:
+                project_table, project_payments = compute_project(lines)
+            except ValueError as exc:
+                st.error(str(exc))
+            else:
+                st.dataframe(project_table, column_config=number_columns(
+                    ["Montant (€)", "Première échéance (€)", "Dernière échéance (€)", "Intérêts totaux (€)",
+                     "Assurance totale (€)"], "%,.2f"), hide_index=True)
+                payment_columns = [column for column in project_payments.columns if column.startswith("Échéance")]
+                import plotly.express as px
+
+                fig = px.area(project_payments, x="Mois", y=payment_columns + ["Assurance (€)"],
+                              labels={"value": "Montant (€)", "variable": "Ligne"},
+                              title="Mensualité totale par ligne de prêt")
+                st.plotly_chart(fig, use_container_width=True)
+                st.download_button(
+                    label="Télécharger l'échéancier combiné CSV",
+                    data=partial(to_bytes, project_payments, "csv"),
+                    file_name="echeancier_multi_prets.csv",
+                    mime='text/csv',
+                    on_click="ignore",
+                )
+# Onglet masqué : l'état de l'éditeur est effacé, le tableau modifié devient son point de départ
+elif "project_loans_edited" in st.session_state:
+    st.session_state["project_loans_base"] = st.session_state.pop("project_loans_edited")
+
+# Libellés de la comparaison de scénarios (paramètres puis résultats du rapport)
+SCENARIO_LABELS = {
+    "property_value": "Valeur du bien (€)",
+    "interest_rate": "Taux d'intérêt (%)",
+    "years": "Durée (années)",
+    "down_payment": "Apport (€)",
+    "notary_fee_rate": "Frais de notaire (%)",
+    "insurance_choice": "Assurance",
+    "insurance_rate": "Taux d'assurance (%)",
+    "insurance_amount": "Assurance fixe (€/mois)",
+    "bank_fees": "Frais de dossier (€)",
+    "guarantee_fees": "Frais de garantie (€)",
+    "debt_ratio": "Ratio d'endettement",
+    "net_to_gross_ratio": "Ratio net/brut",
+    "notary_fees": "Frais de notaire (€)",
+    "project_cost": "Coût du projet (€)",
+    "loan_required": "Prêt nécessaire",
+    "loan_amount": "Montant du prêt (€)",
+    "monthly_payment_bank": "Mensualité hors assurance (€)",
+    "insurance_per_month": "Assurance mensuelle (€)",
+    "monthly_payment": "Mensualité (€)",
+    "total_paid": "Total remboursé (€)",
+    "total_interest": "Intérêts totaux (€)",
+    "taeg": "TAEG (%)",
+    "required_monthly_net_income": "Revenu net mensuel requis (€)",
+    "required_annual_net_income": "Revenu net annuel requis (€)",
+    "required_monthly_gross_income": "Revenu brut mensuel requis (€)",
+    "required_annual_gross_income": "Revenu brut annuel requis (€)",
+}
+
+# Scénarios enregistrés sur disque : les résultats sont relus sans recalcul
+if tab7.open:
+    with tab7, span("Scénarios"):
+        st.subheader("Scénarios enregistrés")
+        store = open_store()
+        current_params = {
+            "property_value": property_value, "interest_rate": interest_rate, "years": years,
+            "down_payment": down_payment, "notary_fee_rate": notary_fee_rate, "insurance_choice": insurance_choice,
+            "insurance_rate": insurance_rate, "insurance_amount": insurance_amount, "bank_fees": bank_fees,
+            "guarantee_fees": guarantee_fees, "debt_ratio": debt_ratio, "net_to_gross_ratio": net_to_gross_ratio,
+        }
+        with st.form("save_scenario"):
+            scenario_name = st.text_input("Nom du scénario", placeholder="Ex. : Dupont - 25 ans, apport 20 k€")
+            if st.form_submit_button("Enregistrer les paramètres actuels"):
+                try:
+                    saved_name = store.save(scenario_name, current_params)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    st.success(f"Scénario « {saved_name} » enregistré.")
+                    # Le scénario enregistré rejoint la comparaison
+                    selection = st.session_state.get("compared_scenarios", [])
+                    st.session_state["compared_scenarios"] = selection + [saved_name] * (saved_name not in selection)
+
+        saved = [scenario["name"] for scenario in store.scenarios()]
+        compared = st.multiselect("Scénarios à comparer", saved, key="compared_scenarios")
+        if compared:
+            comparison = store.compare(compared).rename(index=SCENARIO_LABELS)
+            st.dataframe(comparison.map(lambda value: value if isinstance(value, str) else f"{value:,.2f}"))
+            columns = st.columns(len(compared))
+            for column, name in zip(columns, compared):
+                params = store.load(name)
+                column.download_button(
+                    label=f"PDF « {name} »",
+                    data=partial(store.result, params, "pdf"),
+                    file_name=f"rapport_{name}.pdf",
+                    mime="application/pdf",
+                    on_click="ignore",
+                    key=f"scenario_pdf_{name}",
+                )
+                column.download_button(
+                    label="Amortissement CSV",
+                    data=partial(scenario_schedule_csv, params),
+                    file_name=f"amortissement_{name}.csv",
+                    mime="text/csv",
+                    on_click="ignore",
+                    key=f"scenario_csv_{name}",
+                )
+                if column.button("Supprimer", key=f"scenario_delete_{name}"):
+                    store.delete(name)
+                    st.rerun()
+        st.caption("Résultats sur disque : {entries} ({bytes:,} octets), {hits} lectures, {misses} calculs".format(
+            **store.stats()))
+
+# Statistiques des caches de calcul (affichées en fin de script pour inclure cette exécution)
+with st.sidebar.expander("Statistiques du cache"):
+    if st.button("Vider le cache"):
+        clear_caches()
+    st.dataframe(pd.DataFrame(cache_stats()), hide_index=True)
+
+# Profil de la réexécution : temps (et mémoire) de chaque étape, puis latences du processus
+spans = end_rerun(rerun)
+with st.sidebar.expander("Diagnostic des performances"):
+    st.caption(f"Dernière exécution : {spans[0]['seconds'] * 1e3:,.1f} ms")
+    st.caption(f"Valeurs dérivées recalculées : {', '.join(report.recomputed) or 'aucune'} "
+               f"({len(report.reused)} réutilisées)")
+    if st.toggle("Profiler les exécutions (temps et mémoire)", key="profiling"):
+        profile = pd.DataFrame(spans)
+        profile["span"] = ["\u2003" * depth + path.rsplit("/", 1)[-1] for depth, path in zip(profile["depth"], profile["span"])]
+        if profile["allocated"].isna().all():
+            st.caption("Mémoire non suivie : démarrer le serveur avec SIMULATEUR_TRACEMALLOC=1 pour l'activer.")
+            profile = profile.drop(columns=["allocated", "peak"])
+        st.dataframe(
+            profile.drop(columns="depth"),
+            column_config={
+                "span": "Étape",
+                "seconds": st.column_config.NumberColumn("Temps (s)", format="%.4f"),
+                "self_seconds": st.column_config.NumberColumn("Temps propre (s)", format="%.4f"),
+                "allocated": st.column_config.NumberColumn("Mémoire nette (octets)", format="%d"),
+                "peak": st.column_config.NumberColumn("Hausse du pic (octets)", format="%d"),
+            },
+            hide_index=True,
+        )
+        st.dataframe(
+            pd.DataFrame(metrics_summary()),
+            column_config={
+                "span": "Étape",
+                "count": "Appels",
+                "mean": st.column_config.NumberColumn("Moyenne (s)", format="%.4f"),
+                "p50": st.column_config.NumberColumn("p50 (s)", format="%.4f"),
+                "p90": st.column_config.NumberColumn("p90 (s)", format="%.4f"),
+                "p99": st.column_config.NumberColumn("p99 (s)", format="%.4f"),
+            },
+            hide_index=True,
+        )
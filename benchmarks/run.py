@@ -0,0 +1,240 @@
+# Banc de mesure des calculs financiers et contrôle de non-régression.
+#
+# 1. Valeurs de référence : chaque formule est comparée à une valeur connue (taux nul compris).
+#    Un écart arrête le banc avant toute mesure.
+# 2. Mesures : chaque calcul est chronométré sur des tailles réalistes (meilleur temps et médiane
+#    de plusieurs répétitions) et les résultats sont écrits en JSON.
+# 3. Comparaison : avec --compare, un calcul plus lent que `--threshold` fois la référence
+#    fait échouer le banc (code de sortie 1).
+#
+# Utilisation depuis la racine du dépôt :
+#     python -m benchmarks.run --output benchmarks/resultats.json
+#     python -m benchmarks.run --quick --compare benchmarks/resultats.json
+import argparse
+import inspect
+import itertools
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from simulateur.affordability import affordability_index, max_loan
+from simulateur.amortization import amortization_schedule
+from simulateur.bank_exact import bank_amortization_schedule, bank_schedule_arrays
+from simulateur.batch import OUTPUT_COLUMNS, simulate_portfolio
+from simulateur.derived import loan_graph
+from simulateur.engine import INSURANCE_RATE, loan_report, monthly_payment, principal_from_payment, total_cost
+from simulateur.graph import GraphState
+from simulateur.montecarlo import run_monte_carlo
+from simulateur.prepayment import MODE_PAYMENT, lump_sum, recurring_payment, simulate_prepayments
+from simulateur.project import loan_line, project_schedule
+from simulateur.report import render_pdf_report
+from simulateur.sensitivity import sensitivity_grid
+from simulateur.solver import max_property_value
+from simulateur.tables import yearly_summary
+from simulateur.taeg import taeg
+
+DEFAULT_THRESHOLD = 1.25
+BATCH_SIZES = [1_000, 100_000, 1_000_000]
+
+
+# Valeurs de référence : (nom, calcul, valeur attendue, tolérance relative)
+def golden_checks():
+    payment = float(monthly_payment(200_000, 3.5, 25))
+    zero_rate = amortization_schedule(120_000, 0.0, 10)
+    long_schedule = amortization_schedule(300_000, 4.0, 30)
+    bank_schedule = bank_amortization_schedule(200_000, 3.5, 25)
+    report_params = dict(property_value=300_000, interest_rate=3.1, years=25, down_payment=20_000, debt_ratio=0.33,
+                         net_to_gross_ratio=0.75, notary_fee_rate=7.0, insurance_choice=INSURANCE_RATE,
+                         insurance_rate=0.3, insurance_amount=0.0, bank_fees=1_000.0, guarantee_fees=2_500.0)
+    derived = loan_graph().evaluate(GraphState(), **report_params)
+    smoothed = project_schedule([
+        loan_line("Banque", 200_000, 3.5, 25, smoothed=True),
+        loan_line("PTZ", 60_000, 0.0, 20, deferral_months=120),
+    ])
+    return [
+        ("mensualite_3.5%_25ans", payment, 1001.2471405189859, 1e-12),
+        ("mensualite_taux_nul", float(monthly_payment(120_000, 0.0, 10)), 1000.0, 1e-12),
+        ("interets_totaux", float(total_cost(200_000, 3.5, 25)["total_interest"]), payment * 300 - 200_000, 1e-12),
+        ("amortissement_taux_nul_solde_60", float(zero_rate["Solde restant"].iloc[59]), 60_000.0, 1e-12),
+        ("amortissement_taux_nul_interets", float(zero_rate["Intérêt"].sum()), 0.0, 0.0),
+        ("amortissement_360_capital", float(long_schedule["Capital"].sum()), 300_000.0, 1e-10),
+        ("amortissement_360_solde_final", float(long_schedule["Solde restant"].iloc[-1]), 0.0, 0.0),
+        ("centimes_mensualite", float(bank_schedule["Mensualité"].iloc[0]), 1001.25, 0.0),
+        ("centimes_interets_totaux", float(bank_schedule["Intérêt"].sum()), 100_373.59, 1e-12),
+        ("centimes_derniere_echeance", float(bank_schedule["Mensualité"].iloc[-1]), 999.84, 1e-12),
+        ("centimes_solde_final", float(bank_schedule["Solde restant"].iloc[-1]), 0.0, 0.0),
+        ("graphe_taeg", derived["taeg"], float(loan_report(**report_params)["taeg"]), 1e-12),
+        ("graphe_revenu_brut", derived["required_annual_gross_income"],
+         float(loan_report(**report_params)["required_annual_gross_income"]), 1e-12),
+        ("valeur_maximale_bien", float(max_property_value(30_000, 3.0, 20, 1500, notary_fee_rate=2.0)["property_value"]),
+         294_574.87413599005, 1e-12),
+        ("taeg_sans_frais", float(taeg(200_000, payment, 300)), 3.556695294597049, 1e-10),
+        ("taeg_frais_assurance", float(taeg(200_000, payment, 300, 40, 1000, 2500)), 4.112818036739303, 1e-10),
+        ("remboursement_sans_evenement", simulate_prepayments(200_000, 3.5, 25)["total_interest"],
+         payment * 300 - 200_000, 1e-10),
+        ("pret_maximal_index", max_loan(affordability_index(), 4_000, 3.1, 25),
+         float(principal_from_payment(4_000 * 0.33, 3.1, 25)), 1e-12),
+        ("lissage_mensualite_constante", float(np.ptp(smoothed["total_payment"][:300])), 0.0, 1e-9),
+    ]
+
+
+def check_golden():
+    failures = []
+    for name, value, expected, tolerance in golden_checks():
+        if not math.isclose(value, expected, rel_tol=tolerance, abs_tol=1e-9):
+            failures.append(f"{name} : obtenu {value!r}, attendu {expected!r}")
+    return failures
+
+
+def _scenarios(size, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "property_value": rng.uniform(100_000, 800_000, size).round(-3),
+        "interest_rate": rng.uniform(0.5, 6.0, size).round(2),
+        "years": rng.integers(10, 31, size),
+        "down_payment": rng.uniform(0, 100_000, size).round(-3),
+        "insurance_choice": INSURANCE_RATE,
+        "insurance_rate": 0.3,
+        "bank_fees": 1_000.0,
+    })
+
+
+# Réexécution type de la page : seul le ratio net/brut change, le graphe ne recalcule que les revenus bruts
+_graph, _graph_state, _graph_runs = loan_graph(), GraphState(), itertools.count()
+
+
+def _incremental_report():
+    derived = _graph.evaluate(_graph_state, property_value=300_000.0, interest_rate=3.1, years=25, down_payment=0.0,
+                              debt_ratio=0.33, net_to_gross_ratio=0.7 + next(_graph_runs) % 2 * 0.05,
+                              notary_fee_rate=7.0, insurance_choice=INSURANCE_RATE, insurance_rate=0.3,
+                              insurance_amount=0.0, bank_fees=0.0, guarantee_fees=0.0)
+    return [derived[name] for name in OUTPUT_COLUMNS]
+
+
+# Calculs mesurés : nom -> fonction sans argument (les données sont préparées hors mesure)
+def benchmarks(quick=False):
+    cases = {
+        "rapport_unique": lambda: loan_report(300_000, 3.1, 25, 20_000, 0.33, 0.75, 7.0, INSURANCE_RATE, 0.3),
+        "rapport_graphe_ratio_net_brut": _incremental_report,
+        "rapport_pdf": lambda: inspect.unwrap(render_pdf_report)(
+            300_000, 3.1, 25, 0, 0.33, 0.75, 7.0, 1619.2, 321_000, 485_760, 164_760, 21_000, 321_000, 80.25, 3.3,
+            datetime(2024, 1, 1)),
+        "amortissement_360_mois": lambda: amortization_schedule(300_000, 4.0, 30, 75.0),
+        "synthese_annuelle_360_mois": lambda schedule=amortization_schedule(300_000, 4.0, 30, 75.0): yearly_summary(
+            schedule),
+        "amortissement_360_mois_centimes": lambda: bank_amortization_schedule(300_000, 4.0, 30, 75.0),
+        "remboursement_anticipe": lambda: simulate_prepayments(
+            250_000, 3.5, 25, [recurring_payment(200, 13), lump_sum(60, 20_000, MODE_PAYMENT)], schedule=True),
+        "surface_sensibilite": lambda: sensitivity_grid(
+            320_000, np.arange(0.5, 8.0, 0.05), np.arange(5, 31), np.arange(0, 100_001, 1_000)),
+        "valeur_maximale_bien": lambda: max_property_value(30_000, 3.0, 20, 1_500, 4_000, insurance_rate=0.3),
+        "pret_maximal_index": lambda: max_loan(affordability_index(), 4_000, 3.17, 25),
+        "montage_multi_prets": lambda: project_schedule([
+            loan_line("Banque", 200_000, 3.5, 25, monthly_insurance=40, smoothed=True),
+            loan_line("PTZ", 60_000, 0.0, 20, deferral_months=120),
+            loan_line("Action Logement", 30_000, 1.0, 20),
+        ]),
+        "monte_carlo_10k": lambda: run_monte_carlo(250_000, 25, 3.5, n_paths=10_000, seed=0),
+    }
+    for size in BATCH_SIZES[:-1] if quick else BATCH_SIZES:
+        scenarios = _scenarios(size)
+        cases[f"lot_{size}_dossiers"] = lambda scenarios=scenarios: simulate_portfolio(scenarios)
+        cases[f"amortissement_{size}_prets_centimes"] = lambda scenarios=scenarios: bank_schedule_arrays(
+            scenarios["property_value"].to_numpy(), scenarios["interest_rate"].to_numpy(), scenarios["years"].to_numpy())
+        solver_inputs = scenarios["down_payment"].to_numpy(), scenarios["interest_rate"].to_numpy()
+        cases[f"valeur_maximale_{size}_prospects"] = lambda inputs=solver_inputs: max_property_value(
+            inputs[0], inputs[1], 25, 1_500, 4_000)
+        cases[f"pret_maximal_{size}_revenus"] = lambda scenarios=scenarios: max_loan(
+            affordability_index(), scenarios["property_value"].to_numpy() / 80, scenarios["interest_rate"].to_numpy(),
+            scenarios["years"].to_numpy())
+    return cases
+
+
+# Meilleur temps et médiane sur `repeat` répétitions ; les calculs rapides sont répétés
+# `number` fois par mesure pour dépasser la résolution de l'horloge
+def measure(function, repeat=5, min_time=0.05):
+    start = time.perf_counter()
+    function()
+    number = max(1, int(min_time / max(time.perf_counter() - start, 1e-9)))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return {"min": min(timings), "median": statistics.median(timings), "number": number, "repeat": repeat}
+
+
+def _version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "inconnue"
+
+
+# Calculs plus lents que `threshold` fois la référence (meilleur temps)
+def regressions(results, reference, threshold=DEFAULT_THRESHOLD):
+    slower = []
+    for name, timing in results.items():
+        previous = reference.get(name)
+        if previous and timing["min"] > threshold * previous["min"]:
+            slower.append(f"{name} : {timing['min'] * 1e3:.3f} ms contre {previous['min'] * 1e3:.3f} ms")
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de mesure et contrôle de non-régression du simulateur.")
+    parser.add_argument("--output", help="Fichier JSON où écrire les résultats")
+    parser.add_argument("--compare", help="Fichier JSON de référence (résultats d'une version précédente)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Ralentissement toléré par rapport à la référence (défaut : {DEFAULT_THRESHOLD})")
+    parser.add_argument("--quick", action="store_true", help="Sans le lot d'un million de dossiers")
+    parser.add_argument("--repeat", type=int, default=5, help="Nombre de répétitions par mesure")
+    args = parser.parse_args(argv)
+
+    failures = check_golden()
+    if failures:
+        print("Valeurs de référence incorrectes :", *failures, sep="\n  ")
+        return 1
+    print("Valeurs de référence : OK")
+
+    results = {}
+    for name, function in benchmarks(args.quick).items():
+        results[name] = measure(function, args.repeat)
+        print(f"{name:<36} {results[name]['min'] * 1e3:>12.3f} ms (médiane {results[name]['median'] * 1e3:.3f} ms)")
+
+    if args.output:
+        document = {
+            "version": _version(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(document, handle, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            reference = json.load(handle)["results"]
+        slower = regressions(results, reference, args.threshold)
+        if slower:
+            print(f"Régressions (plus de {args.threshold:g} fois plus lent) :", *slower, sep="\n  ")
+            return 1
+        print("Aucune régression de performance.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
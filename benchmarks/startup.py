@@ -0,0 +1,67 @@
+# Mesure du démarrage à froid des pages Streamlit.
+#
+# Chaque page est exécutée une première fois (streamlit.testing, onglet par défaut) dans un
+# processus neuf : la mesure comprend l'import de Streamlit, des bibliothèques et du simulateur,
+# comme le premier visiteur après un redémarrage du serveur. Le banc vérifie aussi que les
+# bibliothèques lourdes (plotly.express, fpdf) ne sont pas importées par ce premier rendu.
+#
+# Utilisation depuis la racine du dépôt :
+#     python -m benchmarks.startup
+#     python -m benchmarks.startup --budget 3
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["Capacite_Emprunt.py", "pages/valeur_bien_maximal.py"]
+# plotly.graph_objects est déjà importé par Streamlit (sous-modules chargés à la demande)
+DEFERRED_MODULES = ["plotly.express", "fpdf"]
+DEFAULT_BUDGET = 5.0
+
+# Script exécuté dans le processus neuf : durée totale du premier rendu et modules importés
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({path!r}, default_timeout=60).run()
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "errors": [str(item.value) for item in app.exception],
+                  "loaded": [name for name in {modules!r} if name in sys.modules]}}))
+"""
+
+
+def cold_start(page):
+    code = _CHILD.format(path=os.path.join(ROOT, page), modules=DEFERRED_MODULES)
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT, env=env,
+                               check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Démarrage à froid des pages du simulateur.")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help=f"Durée maximale du premier rendu d'une page, en secondes (défaut : {DEFAULT_BUDGET:g})")
+    args = parser.parse_args(argv)
+
+    failures = []
+    for page in PAGES:
+        result = cold_start(page)
+        print(f"{page:<36} {result['seconds']:>8.3f} s")
+        if result["errors"]:
+            failures.append(f"{page} : erreur au rendu ({'; '.join(result['errors'])})")
+        if result["loaded"]:
+            failures.append(f"{page} : modules importés au démarrage ({', '.join(result['loaded'])})")
+        if result["seconds"] > args.budget:
+            failures.append(f"{page} : {result['seconds']:.3f} s pour un budget de {args.budget:g} s")
+    if failures:
+        print("Démarrage à froid hors objectifs :", *failures, sep="\n  ")
+        return 1
+    print("Démarrage à froid : OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,18 @@
 import streamlit as st
 import numpy as np
 import pandas as pd
-from fpdf import FPDF
-import tempfile
+from functools import partial
+
+from simulateur.engine import NOTARY_FEE_RATES
+from simulateur.profiling import begin_rerun, end_rerun, span
+from simulateur.solver import max_property_value
+from simulateur.report import generate_max_property_pdf
+from simulateur.warmup import warm_up
 
 # Configuration de la page
 st.set_page_config(page_title="Valeur maximale du bien", layout="wide", initial_sidebar_state="expanded")
+warm_up()
+rerun = begin_rerun("valeur_bien_maximal")
 
 # --- Pied de page / Informations version ---
 st.sidebar.markdown("---")
@@ -23,10 +30,11 @@ st.markdown(
     """
     Cette page estime la **valeur maximale du bien immobilier** que vous pouvez acheter
     en fonction d'une mensualité cible, d'une durée de prêt, d'un taux d'intérêt et d'un apport initial.
-    Les frais de notaire sont estimés selon le type de bien :
-    - **Neuf** : 2 % du prix du bien
-    - **Ancien** : 7.5 % du prix du bien
-    """
+    Si un revenu net est renseigné, la mensualité est aussi limitée par le taux d'endettement.
+    Les frais de notaire sont estimés selon le type de bien (comme sur la page principale) :
+    - **Neuf** : {neuf:g} % du prix du bien
+    - **Ancien** : {ancien:g} % du prix du bien
+    """.format(neuf=NOTARY_FEE_RATES["Neuf"], ancien=NOTARY_FEE_RATES["Ancien"])
 )
 
 with st.form("max_property_form"):
@@ -35,26 +43,32 @@ with st.form("max_property_form"):
     interest_rate = st.number_input("Taux d'intérêt (%)", min_value=0.0, value=3.0, step=0.1, format="%.2f")
     down_payment = st.number_input("Apport personnel (€)", min_value=0.0, value=30000.0, step=5000.0)
     property_type = st.radio("Type de bien", ["Neuf", "Ancien"], horizontal=True)
+    insurance_rate = st.number_input("Taux d'assurance emprunteur (% du capital par an)", min_value=0.0, value=0.0, step=0.05)
+    monthly_income = st.number_input("Revenu net mensuel (€, 0 pour ignorer)", min_value=0.0, value=0.0, step=100.0)
+    debt_ratio = st.slider("Ratio d'endettement", min_value=0.1, max_value=0.5, value=0.33, step=0.01)
     submitted = st.form_submit_button("Calculer")
 
 if submitted:
-    notary_rates = {"Neuf": 2.0, "Ancien": 7.5}
-    notary_rate = notary_rates[property_type]
-    months = years * 12
-    r = interest_rate / 100 / 12
-    if r > 0:
-        loan_amount = monthly_payment * ((1 + r) ** months - 1) / (r * (1 + r) ** months)
-    else:
-        loan_amount = monthly_payment * months
-    property_value = (loan_amount + down_payment) / (1 + notary_rate / 100)
-    notary_fees = property_value * notary_rate / 100
-    project_cost = property_value + notary_fees
+    notary_rate = NOTARY_FEE_RATES[property_type]
+    with span("max_property_value"):
+        result = max_property_value(
+            down_payment, interest_rate, years, max_payment=monthly_payment,
+            monthly_income=monthly_income or None, debt_ratio=debt_ratio,
+            insurance_rate=insurance_rate, notary_fee_rate=notary_rate,
+        )
+    property_value = float(result["property_value"])
+    notary_fees = float(result["notary_fees"])
+    project_cost = float(result["project_cost"])
+    loan_amount = float(result["loan_amount"])
 
     st.subheader("Résultats")
     st.write(f"- **Valeur maximale du bien :** {property_value:,.2f} €")
     st.write(f"- **Frais de notaire ({notary_rate} %) :** {notary_fees:,.2f} €")
     st.write(f"- **Coût total du projet :** {project_cost:,.2f} €")
     st.write(f"- **Montant emprunté :** {loan_amount:,.2f} €")
+    if insurance_rate or monthly_income:
+        st.write(f"- **Mensualité retenue (assurance incluse) :** {float(result['monthly_payment']):,.2f} €")
+        st.write(f"- **Contrainte limitante :** {result['binding_constraint']}")
 
     data = {
         "Élément": ["Valeur du bien", "Frais de notaire", "Apport", "Montant emprunté"],
@@ -62,37 +76,21 @@ if submitted:
     }
     df = pd.DataFrame(data)
     st.bar_chart(df.set_index("Élément"))
-    st.dataframe(df.style.format({"Montant (€)": "{:.2f}"}))
-
-    pdf = FPDF()
+    st.dataframe(df, column_config={"Montant (€)": st.column_config.NumberColumn(format="%.2f")})
 
-    if hasattr(pdf, "set_doc_option"):
-        pdf.set_doc_option("core_fonts_encoding", "utf-8")
-        euro_symbol = "€"
-    else:
-        euro_symbol = "EUR"
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.cell(0, 10, "Rapport de simulation", ln=True)
-    pdf.cell(0, 10, f"Mensualité maximale : {monthly_payment:.2f} {euro_symbol}", ln=True)
-    pdf.cell(0, 10, f"Durée du prêt : {years} ans", ln=True)
-    pdf.cell(0, 10, f"Taux d'intérêt : {interest_rate:.2f} %", ln=True)
-    pdf.cell(0, 10, f"Apport personnel : {down_payment:.2f} {euro_symbol}", ln=True)
-    pdf.cell(0, 10, f"Type de bien : {property_type}", ln=True)
-    pdf.ln(5)
-    pdf.cell(0, 10, f"Valeur maximale du bien : {property_value:,.2f} {euro_symbol}", ln=True)
-    pdf.cell(0, 10, f"Frais de notaire : {notary_fees:,.2f} {euro_symbol}", ln=True)
-    pdf.cell(0, 10, f"Coût total du projet : {project_cost:,.2f} {euro_symbol}", ln=True)
-    pdf.cell(0, 10, f"Montant emprunté : {loan_amount:,.2f} {euro_symbol}", ln=True)
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        pdf.output(tmp.name)
-        tmp.seek(0)
-        pdf_bytes = tmp.read()
+    # Le PDF est rendu en mémoire, uniquement au clic sur le bouton de téléchargement
+    pdf_bytes = partial(
+        generate_max_property_pdf,
+        monthly_payment, years, interest_rate, down_payment, property_type,
+        property_value, notary_fees, project_cost, loan_amount
+    )
 
     st.download_button(
         label="Télécharger le rapport PDF",
         data=pdf_bytes,
         file_name="valeur_bien_maximale.pdf",
         mime="application/pdf",
+        on_click="ignore",
     )
+
+end_rerun(rerun)
@@ -0,0 +1,34 @@
+# Bibliothèque de calcul du simulateur de prêt immobilier (sans dépendance à Streamlit)
+from simulateur.amortization import (
+    SCHEDULE_COLUMNS,
+    amortization_arrays,
+    amortization_schedule,
+    remaining_balance,
+)
+from simulateur.engine import (
+    INSURANCE_CHOICES,
+    annuity_factor,
+    insurance_per_month,
+    loan_report,
+    monthly_payment,
+    monthly_rate,
+    principal_from_payment,
+    required_income,
+    total_cost,
+)
+
+__all__ = [
+    "INSURANCE_CHOICES",
+    "SCHEDULE_COLUMNS",
+    "amortization_arrays",
+    "amortization_schedule",
+    "annuity_factor",
+    "insurance_per_month",
+    "loan_report",
+    "monthly_payment",
+    "monthly_rate",
+    "principal_from_payment",
+    "remaining_balance",
+    "required_income",
+    "total_cost",
+]
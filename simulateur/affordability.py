@@ -0,0 +1,119 @@
+# Matrice d'accessibilité : revenus requis sur une grille montants × taux × durées × taux
+# d'endettement, et recherche inverse du prêt maximal pour un revenu donné.
+#
+# La recherche inverse s'appuie sur un index précalculé : la mensualité par euro emprunté
+# (facteur d'annuité, assurance au taux comprise) pour chaque couple taux × durée en mois de
+# la grille. Une requête se réduit à une interpolation bilinéaire dans cette table, sans
+# recalcul : prêt maximal = (revenu × taux d'endettement - charges) / facteur. Une requête
+# unitaire passe par une recherche dichotomique en Python pur (quelques microsecondes), un lot
+# par la même interpolation vectorisée.
+from bisect import bisect_right
+
+import numpy as np
+
+from simulateur.cache import memoize
+from simulateur.engine import annuity_factor, monthly_payment, monthly_rate, required_income
+
+# Grille par défaut de l'index : taux de 0 à 10 % par pas de 0,01 point, durées de 5 à 30 ans au mois près
+DEFAULT_RATES = np.round(np.arange(0, 1001) * 0.01, 2)
+DEFAULT_MONTHS = np.arange(60, 361)
+
+
+# Revenus requis pour chaque combinaison ; chaque tableau de résultats a la forme
+# (montants, taux, durées, taux d'endettement), les mensualités la forme (montants, taux, durées)
+def affordability_matrix(loan_amounts, interest_rates, years, debt_ratios, net_to_gross_ratio=0.75,
+                         insurance_rate=0.0):
+    loan_amounts = np.atleast_1d(np.asarray(loan_amounts, dtype=float))
+    interest_rates = np.atleast_1d(np.asarray(interest_rates, dtype=float))
+    years = np.atleast_1d(np.asarray(years))
+    debt_ratios = np.atleast_1d(np.asarray(debt_ratios, dtype=float))
+
+    amounts = loan_amounts[:, np.newaxis, np.newaxis]
+    payments = (monthly_payment(amounts, interest_rates[:, np.newaxis], years)
+                + amounts * insurance_rate / 100 / 12)
+    income = required_income(payments[..., np.newaxis], debt_ratios, net_to_gross_ratio)
+    return {
+        "loan_amount": loan_amounts,
+        "interest_rate": interest_rates,
+        "years": years,
+        "debt_ratio": debt_ratios,
+        "monthly_payment": payments,
+        **income,
+    }
+
+
+# Index de la recherche inverse : facteurs de mensualité par euro emprunté, forme (taux, mois).
+# Mémoïsé sans expiration : construit une fois par grille et par taux d'assurance, les tables
+# préchauffées (simulateur.warmup) restent valables pour toute la vie du processus.
+@memoize(max_entries=8, ttl=None)
+def affordability_index(interest_rates=DEFAULT_RATES, months=DEFAULT_MONTHS, insurance_rate=0.0):
+    interest_rates = np.asarray(interest_rates, dtype=float)
+    months = np.asarray(months, dtype=float)
+    if interest_rates.size < 2 or months.size < 2 or (np.diff(interest_rates) <= 0).any() or (np.diff(months) <= 0).any():
+        raise ValueError("La grille de l'index doit compter au moins deux taux et deux durées, strictement croissants.")
+    factors = annuity_factor(monthly_rate(interest_rates)[:, np.newaxis], months) + insurance_rate / 100 / 12
+    return {
+        "interest_rate": interest_rates,
+        "months": months,
+        "insurance_rate": insurance_rate,
+        "factors": factors,
+        # Copies en listes Python pour la recherche unitaire (bisect)
+        "rate_list": interest_rates.tolist(),
+        "month_list": months.tolist(),
+    }
+
+
+# np.ndim coûte plus cher que toute la recherche unitaire : simple test de type
+def _is_scalar(value):
+    return isinstance(value, (int, float, np.number))
+
+
+def _check_range(grid, low, high, label, unit):
+    if low < grid[0] or high > grid[-1]:
+        raise ValueError(f"{label} hors de la grille de l'index ({grid[0]:g} à {grid[-1]:g} {unit}).")
+
+
+# Position dans une grille croissante : indice de la maille et poids du point suivant
+def _locate(grid, values):
+    index = np.clip(np.searchsorted(grid, values, side="right") - 1, 0, grid.size - 2)
+    weight = (values - grid[index]) / (grid[index + 1] - grid[index])
+    return index, weight
+
+
+def _locate_scalar(grid, value):
+    index = min(max(bisect_right(grid, value) - 1, 0), len(grid) - 2)
+    return index, (value - grid[index]) / (grid[index + 1] - grid[index])
+
+
+# Facteur de mensualité interpolé pour des taux (%) et durées (années) quelconques de la grille
+def lookup_factor(index, interest_rate, years):
+    factors = index["factors"]
+    if _is_scalar(interest_rate) and _is_scalar(years):
+        interest_rate, months = float(interest_rate), float(years) * 12
+        _check_range(index["rate_list"], interest_rate, interest_rate, "Taux", "%")
+        _check_range(index["month_list"], months, months, "Durée", "mois")
+        i, u = _locate_scalar(index["rate_list"], interest_rate)
+        j, v = _locate_scalar(index["month_list"], months)
+        return ((1 - u) * ((1 - v) * factors.item(i, j) + v * factors.item(i, j + 1))
+                + u * ((1 - v) * factors.item(i + 1, j) + v * factors.item(i + 1, j + 1)))
+
+    interest_rate = np.asarray(interest_rate, dtype=float)
+    months = np.asarray(years, dtype=float) * 12
+    _check_range(index["rate_list"], interest_rate.min(), interest_rate.max(), "Taux", "%")
+    _check_range(index["month_list"], months.min(), months.max(), "Durée", "mois")
+    i, u = _locate(index["interest_rate"], interest_rate)
+    j, v = _locate(index["months"], months)
+    return ((1 - u) * ((1 - v) * factors[i, j] + v * factors[i, j + 1])
+            + u * ((1 - v) * factors[i + 1, j] + v * factors[i + 1, j + 1]))
+
+
+# Prêt maximal pour un revenu net mensuel, un taux d'endettement et des charges existantes
+# (crédits en cours, assurance à montant fixe), par lecture de l'index (scalaires ou tableaux)
+def max_loan(index, monthly_net_income, interest_rate, years, debt_ratio=0.33, existing_debts=0.0,
+             insurance_amount=0.0):
+    factor = lookup_factor(index, interest_rate, years)
+    if _is_scalar(factor) and _is_scalar(monthly_net_income) and _is_scalar(debt_ratio):
+        budget = float(monthly_net_income) * debt_ratio - existing_debts - insurance_amount
+        return max(budget, 0.0) / factor
+    budget = np.asarray(monthly_net_income, dtype=float) * debt_ratio - existing_debts - insurance_amount
+    return np.maximum(budget, 0.0) / factor
@@ -0,0 +1,57 @@
+# Tableau d'amortissement calculé en forme fermée.
+#
+# Le solde après k mois vaut B_k = L * ((1 + r)^n - (1 + r)^k) / ((1 + r)^n - 1),
+# ce qui permet de remplir tous les mois d'un coup dans des tableaux NumPy
+# préalloués au lieu d'itérer mois par mois.
+import numpy as np
+import pandas as pd
+
+from simulateur.engine import monthly_payment, monthly_rate
+
+SCHEDULE_COLUMNS = ["Mois", "Mensualité", "Capital", "Intérêt", "Assurance", "Solde restant"]
+
+
+# Soldes restants après chaque mois (dernier axe = mois 0..n)
+def remaining_balance(loan_amount, interest_rate, years):
+    months = int(years * 12)
+    rate = monthly_rate(interest_rate)[..., np.newaxis]
+    loan = np.asarray(loan_amount, dtype=float)[..., np.newaxis]
+    k = np.arange(months + 1, dtype=float)
+    log_growth = np.log1p(rate)
+    total_growth = np.expm1(months * log_growth)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(rate == 0, 1 - k / months, (total_growth - np.expm1(k * log_growth)) / total_growth)
+    return loan * ratio
+
+
+# Colonnes du tableau d'amortissement sous forme de tableaux NumPy.
+# loan_amount, interest_rate et monthly_insurance peuvent être des tableaux (un prêt par ligne),
+# la durée est commune à tous les prêts.
+def amortization_arrays(loan_amount, interest_rate, years, monthly_insurance=0):
+    months = int(years * 12)
+    balances = remaining_balance(loan_amount, interest_rate, years)
+    payment_bank = np.asarray(monthly_payment(loan_amount, interest_rate, years))[..., np.newaxis]
+    insurance = np.asarray(monthly_insurance, dtype=float)[..., np.newaxis]
+    shape = np.broadcast_shapes(balances.shape[:-1], insurance.shape[:-1]) + (months,)
+
+    interest = np.empty(shape)
+    np.multiply(balances[..., :-1], monthly_rate(interest_rate)[..., np.newaxis], out=interest)
+    principal = np.empty(shape)
+    np.subtract(balances[..., :-1], balances[..., 1:], out=principal)
+    remaining = np.empty(shape)
+    np.maximum(balances[..., 1:], 0, out=remaining)
+
+    return {
+        "Mois": np.arange(1, months + 1),
+        "Mensualité": np.broadcast_to(payment_bank + insurance, shape),
+        "Capital": principal,
+        "Intérêt": interest,
+        "Assurance": np.broadcast_to(insurance, shape),
+        "Solde restant": remaining,
+    }
+
+
+# Tableau d'amortissement d'un prêt unique au format DataFrame
+def amortization_schedule(loan_amount, interest_rate, years, monthly_insurance=0):
+    arrays = amortization_arrays(loan_amount, interest_rate, years, monthly_insurance)
+    return pd.DataFrame({column: arrays[column] for column in SCHEDULE_COLUMNS}, columns=SCHEDULE_COLUMNS)
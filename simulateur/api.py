@@ -0,0 +1,371 @@
+# Service HTTP/JSON (ASGI) exposant le simulateur sans interface Streamlit.
+#
+# Points d'entrée (POST, corps JSON : un objet ou une liste d'objets pour un lot) :
+#     /quote         rapport de prêt (mêmes champs que simulateur.batch)
+#     /schedule      tableaux d'amortissement, diffusés en NDJSON (défaut) ou CSV (?format=csv)
+#     /prepayment    remboursements anticipés (liste d'événements ; "rounding" pour l'arrondi bancaire)
+#     /max-property  valeur maximale du bien finançable
+#     /max-loan      prêt maximal pour un revenu (lecture de l'index d'accessibilité)
+#     /sensitivity   surface taux × durée × apport
+#     GET /health    état du service et statistiques du cache de réponses
+#     GET /metrics   durées des requêtes par point d'entrée (format texte Prometheus)
+#
+# Les lots sont calculés de façon vectorisée. Les requêtes volumineuses et les tableaux
+# d'amortissement sont calculés dans un pool de processus (SIMULATEUR_API_WORKERS, nombre de
+# cœurs par défaut) ; les réponses JSON courtes sont mises en cache par corps de requête.
+#
+# Lancement (uvicorn, installé avec Streamlit) :
+#     python -m simulateur.api --port 8000
+#     curl -X POST localhost:8000/quote -d '{"property_value": 300000, "interest_rate": 3.1, "years": 25}'
+import argparse
+import asyncio
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from simulateur.affordability import affordability_index, max_loan
+from simulateur.batch import INPUT_COLUMNS, OUTPUT_COLUMNS
+from simulateur.cache import MemoCache
+from simulateur.engine import INSURANCE_CHOICES, NOTARY_FEE_RATES, loan_report
+from simulateur.export import iter_schedules, to_bytes
+from simulateur.prepayment import MODE_TERM, lump_sum, recurring_payment, simulate_prepayments
+from simulateur.profiling import prometheus_text, span
+from simulateur.sensitivity import sensitivity_grid
+from simulateur.solver import max_property_value
+from simulateur.warmup import warm_up
+
+WORKERS = int(os.environ.get("SIMULATEUR_API_WORKERS", "0")) or os.cpu_count() or 1
+# Au-delà de cette taille de corps (octets), le calcul part dans le pool de processus
+INLINE_BODY_LIMIT = 64 * 1024
+SCHEDULE_LOANS_PER_CHUNK = 500
+# Taille maximale d'une grille /sensitivity (taux × durées × apports)
+MAX_SENSITIVITY_CELLS = 1_000_000
+# Nombre maximal de prêts par requête /schedule et /prepayment
+MAX_SCHEDULE_LOANS = 10_000
+MAX_PREPAYMENT_LOANS = 1_000
+# Durée maximale d'un prêt (années) ; montants, taux et frais ne peuvent pas être négatifs
+MAX_YEARS = 50
+NON_NEGATIVE_FIELDS = [
+    "property_value", "loan_amount", "down_payment", "interest_rate", "notary_fee_rate", "insurance_rate",
+    "insurance_amount", "monthly_insurance", "bank_fees", "guarantee_fees", "max_payment", "monthly_income",
+    "existing_debts",
+]
+# Champs de /max-property et valeurs par défaut (revenu absent : pas de contrainte d'endettement)
+SOLVER_COLUMNS = {
+    "down_payment": None,
+    "interest_rate": None,
+    "years": None,
+    "max_payment": np.inf,
+    "monthly_income": np.inf,
+    "debt_ratio": 0.33,
+    "existing_debts": 0.0,
+    "insurance_rate": 0.0,
+    "insurance_amount": 0.0,
+    "notary_fee_rate": NOTARY_FEE_RATES["Ancien"],
+}
+# Champs de /schedule et valeurs par défaut
+SCHEDULE_COLUMNS = {
+    "loan_amount": None,
+    "interest_rate": None,
+    "years": None,
+    "monthly_insurance": 0.0,
+}
+# Champs d'une requête /prepayment en plus de ceux du prêt, et champs d'un événement
+PREPAYMENT_FIELDS = {"events", "schedule", "rounding", "payment_rounding"}
+EVENT_FIELDS = {"month", "start", "end", "amount", "mode"}
+# Champs de /max-loan et valeurs par défaut
+AFFORDABILITY_COLUMNS = {
+    "monthly_income": None,
+    "interest_rate": None,
+    "years": None,
+    "debt_ratio": 0.33,
+    "existing_debts": 0.0,
+    "insurance_rate": 0.0,
+    "insurance_amount": 0.0,
+}
+
+# Seules les réponses courtes sont mises en cache (corps de requête et réponse inférieurs à
+# RESPONSE_CACHE_ENTRY_LIMIT octets) : la mémoire du cache reste bornée à environ 64 Mo
+RESPONSE_CACHE_ENTRY_LIMIT = 16 * 1024
+response_cache = MemoCache("api_responses", max_entries=4096)
+
+
+def _records(payload, max_records=None):
+    if isinstance(payload, dict):
+        return [payload]
+    if isinstance(payload, list) and all(isinstance(item, dict) for item in payload):
+        if max_records is not None and len(payload) > max_records:
+            raise ValueError(f"Lot trop grand : {len(payload)} objets (maximum {max_records}).")
+        return payload
+    raise ValueError("Le corps doit être un objet JSON ou une liste d'objets.")
+
+
+# Bornes des champs numériques (les comparaisons écrites en négatif refusent aussi NaN)
+def _check_ranges(columns):
+    if "years" in columns and not ((columns["years"] * 12 >= 1) & (columns["years"] <= MAX_YEARS)).all():
+        raise ValueError(f"La durée (years) doit être comprise entre un mois et {MAX_YEARS} ans.")
+    negative = [name for name in NON_NEGATIVE_FIELDS if name in columns and not (columns[name] >= 0).all()]
+    if negative:
+        raise ValueError(f"Valeurs négatives refusées : {', '.join(negative)}")
+
+
+# Champs des objets d'un lot -> tableaux NumPy, champs absents ou null remplacés par leur valeur
+# par défaut (`fields` : nom -> défaut, None pour un champ obligatoire). Sans passer par pandas,
+# dont le coût fixe dominerait le calcul d'un devis unique.
+def _columns(records, fields):
+    unknown = set().union(*records) - set(fields)
+    if unknown:
+        raise ValueError(f"Champs inconnus : {', '.join(sorted(unknown))}")
+    missing = [name for name, default in fields.items()
+               if default is None and any(record.get(name) is None for record in records)]
+    if missing:
+        raise ValueError(f"Champs obligatoires manquants : {', '.join(missing)}")
+    columns = {}
+    for name, default in fields.items():
+        values = [default if record.get(name) is None else record[name] for record in records]
+        columns[name] = np.array(values, dtype=object if isinstance(default, str) else float)
+    _check_ranges(columns)
+    return columns
+
+
+# Résultats vectorisés -> liste d'objets JSON (NaN devient null)
+def _json_records(result, names, size):
+    columns = [np.broadcast_to(result[name], size).tolist() for name in names]
+    return [{name: None if value != value else value for name, value in zip(names, row)} for row in zip(*columns)]
+
+
+# Valeurs JSON d'un DataFrame : NaN devient null
+def _json_frame(frame):
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+
+
+def _single_or_batch(payload, results):
+    return results[0] if isinstance(payload, dict) else results
+
+
+def _check_insurance(choices):
+    unknown = set(np.atleast_1d(choices).tolist()) - set(INSURANCE_CHOICES)
+    if unknown:
+        raise ValueError(f"Choix d'assurance inconnu : {', '.join(map(repr, sorted(unknown, key=str)))} "
+                         f"(attendu : {', '.join(INSURANCE_CHOICES)})")
+
+
+def quote(payload):
+    records = _records(payload)
+    columns = _columns(records, INPUT_COLUMNS)
+    _check_insurance(columns["insurance_choice"])
+    report = loan_report(**columns)
+    return _single_or_batch(payload, _json_records(report, OUTPUT_COLUMNS, len(records)))
+
+
+def _event(event):
+    if not isinstance(event, dict):
+        raise ValueError(f"Un événement doit être un objet JSON : {event!r}")
+    unknown = set(event) - EVENT_FIELDS
+    if unknown:
+        raise ValueError(f"Champs d'événement inconnus : {', '.join(sorted(unknown))}")
+    mode = event.get("mode", MODE_TERM)
+    if "month" in event:
+        return lump_sum(event["month"], event["amount"], mode)
+    return recurring_payment(event["amount"], event.get("start", 1), event.get("end"), mode)
+
+
+def prepayment(payload):
+    results = []
+    for request in _records(payload, MAX_PREPAYMENT_LOANS):
+        loan = _columns([{name: value for name, value in request.items() if name not in PREPAYMENT_FIELDS}],
+                        SCHEDULE_COLUMNS)
+        events = request.get("events", [])
+        if not isinstance(events, list):
+            raise ValueError("Le champ events doit être une liste d'événements.")
+        result = simulate_prepayments(float(loan["loan_amount"][0]), float(loan["interest_rate"][0]),
+                                      float(loan["years"][0]), [_event(event) for event in events],
+                                      float(loan["monthly_insurance"][0]), request.get("schedule", False),
+                                      request.get("rounding"), request.get("payment_rounding"))
+        if "schedule" in result:
+            result["schedule"] = _json_frame(result["schedule"])
+        results.append(result)
+    return _single_or_batch(payload, results)
+
+
+def max_property(payload):
+    records = _records(payload)
+    if any(record.get("max_payment") is None and record.get("monthly_income") is None for record in records):
+        raise ValueError("Renseigner max_payment ou monthly_income (au moins une contrainte).")
+    result = max_property_value(**_columns(records, SOLVER_COLUMNS))
+    return _single_or_batch(payload, _json_records(result, list(result), len(records)))
+
+
+# Un index par taux d'assurance présent dans le lot (mémoïsé, construit une seule fois)
+def max_loan_lookup(payload):
+    records = _records(payload)
+    columns = _columns(records, AFFORDABILITY_COLUMNS)
+    loans = np.empty(len(records))
+    for insurance_rate in np.unique(columns["insurance_rate"]):
+        rows = columns["insurance_rate"] == insurance_rate
+        loans[rows] = max_loan(affordability_index(insurance_rate=float(insurance_rate)), columns["monthly_income"][rows],
+                               columns["interest_rate"][rows], columns["years"][rows], columns["debt_ratio"][rows],
+                               columns["existing_debts"][rows], columns["insurance_amount"][rows])
+    return _single_or_batch(payload, [{"max_loan": value} for value in loans.tolist()])
+
+
+# Nombre de valeurs de start à stop inclus par pas de step (pas strictement positif)
+def _step_count(name, start, stop, step):
+    if not step > 0:
+        raise ValueError(f"Le pas {name} doit être strictement positif.")
+    return max(int((stop - start) / step) + 1, 0)
+
+
+def sensitivity(payload):
+    rate_min, rate_max, rate_step = payload["rate_min"], payload["rate_max"], payload["rate_step"]
+    down_max, down_step = payload.get("down_max", 0), payload.get("down_step", 10_000)
+    years = payload.get("years", list(range(5, 31)))
+    cells = (_step_count("rate_step", rate_min, rate_max, rate_step) * _step_count("down_step", 0, down_max, down_step)
+             * np.size(years))
+    if cells > MAX_SENSITIVITY_CELLS:
+        raise ValueError(f"Grille trop grande : {cells} cases (maximum {MAX_SENSITIVITY_CELLS}).")
+    insurance_choice = payload.get("insurance_choice", INPUT_COLUMNS["insurance_choice"])
+    _check_insurance(insurance_choice)
+    grid = sensitivity_grid(
+        payload["project_cost"],
+        np.arange(rate_min, rate_max + rate_step / 2, rate_step),
+        years,
+        np.arange(0, down_max + down_step / 2, down_step),
+        insurance_choice,
+        payload.get("insurance_rate", 0.0),
+        payload.get("insurance_amount", 0.0),
+    )
+    return {name: np.asarray(values).tolist() for name, values in grid.items()}
+
+
+ENDPOINTS = {
+    "/quote": quote,
+    "/prepayment": prepayment,
+    "/max-property": max_property,
+    "/max-loan": max_loan_lookup,
+    "/sensitivity": sensitivity,
+}
+
+
+# Calcul complet d'une requête JSON -> (statut, octets de la réponse) ; exécutable dans le pool.
+# Un résultat non fini (infini, NaN) n'est pas du JSON valide : la requête est refusée.
+def compute(path, body):
+    try:
+        result = ENDPOINTS[path](json.loads(body))
+        content = json.dumps(result, ensure_ascii=False, allow_nan=False)
+    except (ValueError, KeyError, TypeError) as exc:
+        message = f"Champ manquant : {exc}" if isinstance(exc, KeyError) else str(exc)
+        return 400, json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+    return 200, content.encode("utf-8")
+
+
+def render_schedules(loans, export_format, header):
+    frames = iter_schedules(loans["loan_amount"], loans["interest_rate"], loans["years"],
+                            loans["monthly_insurance"], loan_ids=loans["loan_id"])
+    if export_format == "csv":
+        data = to_bytes(frames, "csv")
+        return data if header else data.split(b"\n", 1)[1]
+    return b"".join(frame.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8") + b"\n"
+                    for frame in frames)
+
+
+# Prêts validés et convertis en tableaux avant la réponse : une erreur de saisie donne un 400,
+# pas un flux interrompu après l'envoi des en-têtes
+def _schedule_blocks(payload):
+    loans = _columns(_records(payload, MAX_SCHEDULE_LOANS), SCHEDULE_COLUMNS)
+    loans["loan_id"] = np.arange(1, loans["loan_amount"].size + 1)
+    for start in range(0, loans["loan_id"].size, SCHEDULE_LOANS_PER_CHUNK):
+        yield {name: values[start:start + SCHEDULE_LOANS_PER_CHUNK] for name, values in loans.items()}
+
+
+# Tables partagées construites au démarrage, avant la première requête
+@asynccontextmanager
+async def lifespan(app):
+    warm_up(background=False)
+    with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+        app.state.pool = pool
+        yield
+
+
+async def _run(request, function, *args):
+    pool = getattr(request.app.state, "pool", None)
+    if pool is None:
+        return function(*args)
+    return await asyncio.get_running_loop().run_in_executor(pool, function, *args)
+
+
+async def json_endpoint(request):
+    body = await request.body()
+    key = (request.url.path, body)
+    found, cached = response_cache.get(key)
+    with span(request.url.path):
+        if found:
+            status, content = cached
+        elif len(body) > INLINE_BODY_LIMIT:
+            status, content = await _run(request, compute, request.url.path, body)
+        else:
+            status, content = compute(request.url.path, body)
+    if not found and status == 200 and max(len(body), len(content)) <= RESPONSE_CACHE_ENTRY_LIMIT:
+        response_cache.put(key, (status, content))
+    return Response(content, status_code=status, media_type="application/json")
+
+
+# Tableaux diffusés bloc par bloc, dans l'ordre, avec au plus `2 * WORKERS` blocs en calcul
+async def schedule_endpoint(request):
+    export_format = request.query_params.get("format", "ndjson")
+    if export_format not in ("ndjson", "csv"):
+        return JSONResponse({"error": "Format attendu : ndjson ou csv."}, status_code=400)
+    try:
+        blocks = list(_schedule_blocks(json.loads(await request.body())))
+    except (ValueError, TypeError) as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
+
+    async def stream():
+        pending = deque()
+        for index, block in enumerate(blocks):
+            pending.append(asyncio.ensure_future(_run(request, render_schedules, block, export_format, index == 0)))
+            if len(pending) >= 2 * WORKERS:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
+
+
+async def health(request):
+    return JSONResponse({"status": "ok", "workers": WORKERS, "cache": response_cache.stats()})
+
+
+async def metrics(request):
+    return Response(prometheus_text(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+app = Starlette(
+    routes=[Route(path, json_endpoint, methods=["POST"]) for path in ENDPOINTS]
+    + [Route("/schedule", schedule_endpoint, methods=["POST"]), Route("/health", health),
+       Route("/metrics", metrics)],
+    lifespan=lifespan,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service HTTP/JSON du simulateur de prêt immobilier.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# Mode « arrondi bancaire » : tableaux d'amortissement calculés en centimes entiers.
+#
+# Comme dans les offres de prêt, la mensualité est arrondie au centime une fois pour toutes,
+# les intérêts de chaque mois sont calculés sur le solde en centimes et arrondis au centime,
+# le capital remboursé est la différence, et la dernière échéance est ajustée pour solder
+# exactement le capital restant. Les règles d'arrondi sont réglables séparément pour les
+# intérêts et pour la mensualité (et l'assurance).
+#
+# Les montants sont des tableaux int64 (centimes) et le taux un entier en dix-millièmes de
+# point : intérêts = solde × taux / 12 000 000, division entière exacte avec la règle choisie.
+# La récurrence d'un mois sur l'autre est parcourue mois par mois, mais chaque pas traite tous
+# les prêts du lot à la fois (un prêt par ligne, durées différentes possibles).
+import numpy as np
+import pandas as pd
+
+from simulateur.amortization import SCHEDULE_COLUMNS
+from simulateur.engine import annuity_factor
+
+ROUND_HALF_UP = "demi-supérieur"
+ROUND_HALF_EVEN = "bancaire"
+ROUND_DOWN = "troncature"
+ROUND_UP = "supérieur"
+ROUNDING_RULES = [ROUND_HALF_UP, ROUND_HALF_EVEN, ROUND_DOWN, ROUND_UP]
+
+# Précision des taux : 3,1245 % est représenté par 31 245
+RATE_SCALE = 10_000
+INTEREST_DIVISOR = 12 * 100 * RATE_SCALE
+# Tolérance (en centimes) sur les erreurs de représentation des montants décimaux
+_EPSILON = 1e-6
+
+# Fin d'un versement anticipé (tableau `event_ends`) : comme dans simulateur.prepayment, le
+# mode « durée » avance la date de fin prévue et le mode « mensualité » recalcule la mensualité
+END_TERM = 1
+END_PAYMENT = 2
+
+
+def _check_rule(rule):
+    if rule not in ROUNDING_RULES:
+        raise ValueError(f"Règle d'arrondi inconnue : {rule!r} (attendu : {', '.join(ROUNDING_RULES)})")
+
+
+# Montants en euros (flottants) -> centimes entiers selon la règle d'arrondi
+def to_cents(amount, rule=ROUND_HALF_UP):
+    return round_cents(np.asarray(amount, dtype=float) * 100, rule)
+
+
+# Centimes fractionnaires (flottants) -> centimes entiers selon la règle d'arrondi
+def round_cents(cents, rule=ROUND_HALF_UP):
+    _check_rule(rule)
+    cents = np.asarray(cents, dtype=float)
+    if rule == ROUND_DOWN:
+        return np.floor(cents + _EPSILON).astype(np.int64)
+    if rule == ROUND_UP:
+        return np.ceil(cents - _EPSILON).astype(np.int64)
+    rounded = np.floor(cents + 0.5 + _EPSILON)
+    if rule == ROUND_HALF_EVEN:
+        tie = np.abs(cents + 0.5 - rounded) <= _EPSILON
+        rounded -= tie & (rounded % 2 == 1)
+    return rounded.astype(np.int64)
+
+
+# Division entière numerator / divisor (numérateur positif ou nul) arrondie selon la règle
+def divide(numerator, divisor, rule=ROUND_HALF_UP):
+    _check_rule(rule)
+    quotient, remainder = np.divmod(numerator, divisor)
+    if rule == ROUND_UP:
+        return quotient + (remainder > 0)
+    if rule == ROUND_HALF_UP:
+        return quotient + (2 * remainder >= divisor)
+    if rule == ROUND_HALF_EVEN:
+        return quotient + ((2 * remainder > divisor) | ((2 * remainder == divisor) & (quotient % 2 == 1)))
+    return quotient
+
+
+# Taux annuels (%) -> entiers en dix-millièmes de point
+def rate_units(interest_rate):
+    return np.rint(np.asarray(interest_rate, dtype=float) * RATE_SCALE).astype(np.int64)
+
+
+# Nombre d'échéances de `payment` centimes nécessaires pour solder `balance` (formule fermée,
+# à l'arrondi près ; une mensualité qui ne couvre pas les intérêts ne solde jamais le prêt)
+def _months_to_payoff(balance, payment, rate):
+    balance, payment = balance.astype(float), payment.astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exact = np.where(rate == 0, balance / payment,
+                         np.log(payment / (payment - balance * rate)) / np.log1p(rate))
+    exact = np.where(payment > balance * rate, exact, np.inf)
+    months = np.ceil(np.minimum(exact, 1e6) - 1e-7).astype(np.int64)
+    return np.where(balance > 0, np.maximum(months, 1), 0)
+
+
+# Tableaux d'amortissement en centimes d'un lot de prêts.
+# loan_amount, interest_rate, years et monthly_insurance : scalaires ou tableaux d'une ligne par
+# prêt. extra_payments (centimes) et event_ends (END_TERM | END_PAYMENT) : tableaux
+# (prêts, mois) des versements anticipés ajoutés à chaque échéance et des fins d'événements.
+# Renvoie des tableaux int64 (prêts, mois) complétés par des zéros après la dernière échéance,
+# le nombre d'échéances payées et la dernière mensualité contractuelle de chaque prêt.
+def bank_schedule_arrays(loan_amount, interest_rate, years, monthly_insurance=0.0, extra_payments=None,
+                         event_ends=None, rounding=ROUND_HALF_UP, payment_rounding=None):
+    payment_rounding = payment_rounding or rounding
+    loans, rates, terms, insurance = np.broadcast_arrays(
+        np.atleast_1d(to_cents(loan_amount, payment_rounding)), rate_units(interest_rate),
+        (np.asarray(years) * 12).astype(np.int64), to_cents(monthly_insurance, payment_rounding))
+    size, months = loans.size, int(terms.max())
+    monthly = rates / INTEREST_DIVISOR
+    payment = round_cents(loans * annuity_factor(monthly, terms), payment_rounding)
+
+    balance = loans.copy()
+    end_month = terms.copy()
+    paid = np.zeros((size, months), dtype=np.int64)
+    principal = np.zeros((size, months), dtype=np.int64)
+    interest = np.zeros((size, months), dtype=np.int64)
+    remaining = np.zeros((size, months), dtype=np.int64)
+    # Un prêt soldé a un solde nul : intérêts nuls et échéance ajustée à zéro, sans masque
+    for month in range(months):
+        if not balance.any():
+            break
+        due_interest = divide(balance * rates, INTEREST_DIVISOR, rounding)
+        due = payment if extra_payments is None else payment + extra_payments[:, month]
+        # Dernière échéance : ajustée au capital restant (date contractuelle ou solde couvert)
+        repaid = due - due_interest
+        repaid = np.where((month + 1 >= terms) | (repaid >= balance), balance, repaid)
+        balance = balance - repaid
+        principal[:, month] = repaid
+        interest[:, month] = due_interest
+        paid[:, month] = repaid + due_interest
+        remaining[:, month] = balance
+        if event_ends is not None and event_ends[:, month].any():
+            ends = event_ends[:, month]
+            term_end = (ends & END_TERM).astype(bool) & (balance > 0)
+            end_month = np.where(term_end, np.minimum(terms, month + 1 + _months_to_payoff(balance, payment, monthly)),
+                                 end_month)
+            payment_end = (ends & END_PAYMENT).astype(bool) & (balance > 0)
+            recast = round_cents(balance * annuity_factor(monthly, np.maximum(end_month - month - 1, 1)),
+                                 payment_rounding)
+            payment = np.where(payment_end, recast, payment)
+
+    count = np.count_nonzero(paid, axis=1)
+    return {
+        "Mois": np.arange(1, months + 1),
+        "Mensualité": paid + np.where(paid > 0, insurance[:, np.newaxis], 0),
+        "Capital": principal,
+        "Intérêt": interest,
+        "Assurance": np.where(paid > 0, insurance[:, np.newaxis], 0),
+        "Solde restant": remaining,
+        "months": count,
+        "final_payment": payment,
+    }
+
+
+# Tableau d'amortissement d'un prêt unique en mode arrondi bancaire (montants en euros)
+def bank_amortization_schedule(loan_amount, interest_rate, years, monthly_insurance=0.0, rounding=ROUND_HALF_UP,
+                               payment_rounding=None):
+    arrays = bank_schedule_arrays(loan_amount, interest_rate, years, monthly_insurance, rounding=rounding,
+                                  payment_rounding=payment_rounding)
+    count = int(arrays["months"][0])
+    frame = {"Mois": arrays["Mois"][:count]}
+    for column in SCHEDULE_COLUMNS[1:]:
+        frame[column] = arrays[column][0, :count] / 100
+    return pd.DataFrame(frame, columns=SCHEDULE_COLUMNS)
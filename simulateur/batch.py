@@ -0,0 +1,123 @@
+# Simulation en lot d'un portefeuille de dossiers (CSV ou Parquet), sans interface.
+#
+# Le fichier d'entrée est lu par blocs de `chunksize` lignes et chaque bloc est calculé
+# de façon vectorisée puis écrit immédiatement : la mémoire reste bornée quelle que soit
+# la taille du portefeuille.
+#
+# Utilisation en ligne de commande :
+#     python -m simulateur.batch dossiers.csv resultats.parquet --chunksize 200000
+#     python -m simulateur.batch dossiers.csv tableaux.csv.gz --schedules
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from simulateur.engine import INSURANCE_NONE, NOTARY_FEE_RATES, loan_report
+from simulateur.export import file_format, iter_schedules, require_pyarrow, write_frames
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Colonnes attendues en entrée et valeurs par défaut des colonnes facultatives
+INPUT_COLUMNS = {
+    "property_value": None,
+    "interest_rate": None,
+    "years": None,
+    "down_payment": 0.0,
+    "notary_fee_rate": NOTARY_FEE_RATES["Ancien"],
+    "insurance_choice": INSURANCE_NONE,
+    "insurance_rate": 0.0,
+    "insurance_amount": 0.0,
+    "bank_fees": 0.0,
+    "guarantee_fees": 0.0,
+    "debt_ratio": 0.33,
+    "net_to_gross_ratio": 0.75,
+}
+
+OUTPUT_COLUMNS = [
+    "notary_fees",
+    "project_cost",
+    "loan_required",
+    "loan_amount",
+    "monthly_payment_bank",
+    "insurance_per_month",
+    "monthly_payment",
+    "total_paid",
+    "total_interest",
+    "taeg",
+    "required_monthly_net_income",
+    "required_annual_net_income",
+    "required_monthly_gross_income",
+    "required_annual_gross_income",
+]
+
+
+# Calcule le rapport de prêt pour chaque ligne d'un DataFrame de dossiers.
+# Les colonnes d'entrée sont conservées et les résultats ajoutés à droite.
+def simulate_portfolio(applicants):
+    missing = [name for name, default in INPUT_COLUMNS.items() if default is None and name not in applicants]
+    if missing:
+        raise ValueError(f"Colonnes obligatoires manquantes : {', '.join(missing)}")
+
+    inputs = {
+        name: applicants[name].to_numpy() if name in applicants else default
+        for name, default in INPUT_COLUMNS.items()
+    }
+    inputs["insurance_choice"] = np.asarray(inputs["insurance_choice"], dtype=object)
+    report = loan_report(**inputs)
+
+    results = applicants.copy()
+    for column in OUTPUT_COLUMNS:
+        results[column] = np.broadcast_to(report[column], len(applicants))
+    return results
+
+
+# Lit le fichier de dossiers bloc par bloc
+def iter_applicants(input_path, chunksize=DEFAULT_CHUNKSIZE):
+    if file_format(input_path) == "parquet":
+        pa = require_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(input_path)
+        for record_batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield record_batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_path, chunksize=chunksize)
+
+
+# Tableaux d'amortissement des dossiers, numérotés dans l'ordre du fichier (colonne "Prêt")
+def iter_portfolio_schedules(chunks):
+    first_id = 1
+    for chunk in chunks:
+        results = simulate_portfolio(chunk)
+        yield from iter_schedules(results["loan_amount"].to_numpy(), results["interest_rate"].to_numpy(),
+                                  results["years"].to_numpy(), results["insurance_per_month"].to_numpy(),
+                                  loan_ids=np.arange(first_id, first_id + len(results)))
+        first_id += len(results)
+
+
+# Simule un portefeuille complet fichier -> fichier et renvoie le nombre de lignes traitées
+# (avec schedules=True, les tableaux d'amortissement de tous les dossiers à la place des résultats)
+def run_batch(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, schedules=False):
+    if schedules:
+        return write_frames(iter_portfolio_schedules(iter_applicants(input_path, chunksize)), output_path)
+    chunks = (simulate_portfolio(chunk) for chunk in iter_applicants(input_path, chunksize))
+    return write_frames(chunks, output_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulation en lot de dossiers de prêt immobilier.")
+    parser.add_argument("input", help="Fichier de dossiers (.csv ou .parquet)")
+    parser.add_argument("output", help="Fichier de résultats (.csv, .csv.gz ou .parquet)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"Nombre de lignes traitées par bloc (défaut : {DEFAULT_CHUNKSIZE})")
+    parser.add_argument("--schedules", action="store_true",
+                        help="Écrire les tableaux d'amortissement de tous les dossiers plutôt que les résultats")
+    args = parser.parse_args(argv)
+
+    rows = run_batch(args.input, args.output, args.chunksize, args.schedules)
+    if args.schedules:
+        print(f"{rows} lignes d'amortissement -> {args.output}")
+    else:
+        print(f"{rows} dossiers simulés -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
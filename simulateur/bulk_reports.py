@@ -0,0 +1,197 @@
+# Génération en masse des rapports PDF détaillés pour un tableau de scénarios.
+#
+# Les scénarios (mêmes colonnes que simulateur.batch) sont découpés en tâches rendues
+# en parallèle par un pool de processus. Le nombre de tâches en vol est borné et les
+# résultats sont consommés dans l'ordre d'entrée : les rapports sont écrits au fil de
+# l'eau dans une archive ZIP (un PDF par scénario) ou dans un PDF unique multipage,
+# sans jamais garder le document complet en mémoire.
+# La date de génération est figée pour que deux exécutions produisent des fichiers identiques.
+#
+# Utilisation en ligne de commande :
+#     python -m simulateur.bulk_reports dossiers.csv rapports.zip --workers 8 --date 2025-08-15
+import argparse
+import inspect
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from fpdf import FPDF
+
+from simulateur.batch import INPUT_COLUMNS, iter_applicants, simulate_portfolio
+from simulateur.report import add_loan_report_page, pdf_to_bytes, render_pdf_report
+
+DEFAULT_TASK_SIZE = 500
+
+# Horodatage fixe des entrées de l'archive (le minimum accepté par le format ZIP)
+ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+
+REPORT_ARGUMENTS = [
+    "property_value", "interest_rate", "years", "down_payment", "debt_ratio", "net_to_gross_ratio",
+    "notary_fee_rate", "monthly_payment", "loan_amount", "total_paid", "total_interest", "notary_fees",
+    "project_cost", "insurance_per_month", "taeg",
+]
+
+
+# Arguments de render_pdf_report pour chaque scénario (colonnes facultatives complétées)
+def _report_rows(scenarios):
+    results = simulate_portfolio(scenarios)
+    for name, default in INPUT_COLUMNS.items():
+        if name not in results:
+            results[name] = default
+    return results[REPORT_ARGUMENTS].itertuples(index=False, name=None)
+
+
+# Tâche exécutée dans un processus du pool : un PDF par scénario, ou un seul PDF multipage
+def _render_task(scenarios, generated_at, merged):
+    if merged:
+        pdf = FPDF()
+        for arguments in _report_rows(scenarios):
+            add_loan_report_page(pdf, *arguments, generated_at=generated_at)
+        return [pdf_to_bytes(pdf)]
+    render = inspect.unwrap(render_pdf_report)
+    return [render(*arguments, generated_at=generated_at) for arguments in _report_rows(scenarios)]
+
+
+def _iter_tasks(scenarios, task_size):
+    if isinstance(scenarios, (str, os.PathLike)):
+        yield from iter_applicants(scenarios, task_size)
+    else:
+        for start in range(0, len(scenarios), task_size):
+            yield scenarios.iloc[start:start + task_size]
+
+
+# Rend les rapports dans l'ordre des scénarios, avec au plus `workers * 2` tâches en vol
+def iter_rendered_reports(scenarios, generated_at, workers=None, task_size=DEFAULT_TASK_SIZE, merged=False):
+    tasks = _iter_tasks(scenarios, task_size)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for task in tasks:
+            yield from _render_task(task, generated_at, merged)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_render_task, task, generated_at, merged))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+# Archive ZIP contenant un rapport par scénario (rapport_000001.pdf, ...)
+def write_reports_zip(scenarios, output_path, generated_at, workers=None, task_size=DEFAULT_TASK_SIZE):
+    count = 0
+    with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for count, data in enumerate(iter_rendered_reports(scenarios, generated_at, workers, task_size), start=1):
+            entry = zipfile.ZipInfo(f"rapport_{count:06d}.pdf", date_time=ZIP_TIMESTAMP)
+            entry.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(entry, data)
+    return count
+
+
+# Assemblage incrémental du PDF unique : les objets de chaque PDF rendu par une tâche sont
+# recopiés tels quels dans le fichier de sortie, renumérotés, et leurs pages rattachées à un
+# arbre de pages commun écrit à la fin. Seuls les offsets des objets et la liste des pages
+# restent en mémoire (quelques octets par page), jamais le document complet.
+# Le format lu est celui produit par fpdf : table xref classique, sans flux d'objets.
+_REFERENCE = re.compile(rb"(\d+) 0 R")
+_MEDIA_BOX = re.compile(rb"/MediaBox \[[^\]]*\]")
+_INFO = re.compile(rb"/Info (\d+) 0 R")
+
+
+class _PdfAppender:
+    def __init__(self, handle):
+        self.handle = handle
+        self.offsets = {}
+        self.kids = []
+        self.next_id = 3  # 1 : catalogue, 2 : arbre des pages
+        handle.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write_object(self, number, body):
+        self.offsets[number] = self.handle.tell()
+        self.handle.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    def append(self, data):
+        xref = int(data[data.rindex(b"startxref") + 9:].split()[0])
+        trailer = data[data.index(b"trailer", xref):]
+        lines = data[xref:data.index(b"trailer", xref)].split(b"\n")[2:]
+        offsets = {number: int(line[:10]) for number, line in enumerate(lines) if line[17:18] == b"n"}
+        bounds = sorted(offsets.values()) + [xref]
+        ends = dict(zip(bounds, bounds[1:]))
+        skipped = {int(_INFO.search(trailer).group(1))}
+
+        bodies, mapping, media_box = {}, {}, b""
+        for number, offset in offsets.items():
+            body = data[offset:ends[offset]]
+            body = body[body.index(b" obj") + 4:body.rindex(b"endobj")].strip(b"\n")
+            head = body.partition(b"stream\n")[0]
+            if b"/Type /Catalog" in head or number in skipped:
+                continue
+            if b"/Type /Pages" in head:
+                mapping[number] = 2
+                media_box = _MEDIA_BOX.search(head).group(0)
+                continue
+            mapping[number] = self.next_id
+            self.next_id += 1
+            bodies[number] = body
+
+        for number, body in sorted(bodies.items()):
+            head, separator, stream = body.partition(b"stream\n")
+            head = _REFERENCE.sub(lambda match: b"%d 0 R" % mapping[int(match.group(1))], head)
+            if b"/Type /Page\n" in head:
+                head = head.replace(b"/Type /Page\n", b"/Type /Page\n" + media_box + b"\n", 1)
+                self.kids.append(mapping[number])
+            self._write_object(mapping[number], head + separator + stream)
+
+    def close(self, generated_at):
+        kids = b" ".join(b"%d 0 R" % kid for kid in self.kids)
+        self._write_object(2, b"<</Type /Pages\n/Kids [%s]\n/Count %d\n>>" % (kids, len(self.kids)))
+        self._write_object(1, b"<</Type /Catalog\n/Pages 2 0 R\n>>")
+        info = self.next_id
+        stamp = generated_at.strftime("%Y%m%d%H%M%S").encode("ascii")
+        self._write_object(info, b"<</Producer (simulateur.bulk_reports)\n/CreationDate (D:%s)\n>>" % stamp)
+
+        xref = self.handle.tell()
+        entries = b"".join(b"%010d 00000 n \n" % self.offsets[number] for number in range(1, info + 1))
+        self.handle.write(b"xref\n0 %d\n0000000000 65535 f \n" % (info + 1) + entries)
+        self.handle.write(b"trailer\n<<\n/Size %d\n/Root 1 0 R\n/Info %d 0 R\n>>\nstartxref\n%d\n%%%%EOF\n"
+                          % (info + 1, info, xref))
+        return len(self.kids)
+
+
+# PDF unique dont chaque page est le rapport d'un scénario, écrit au fil de l'eau (voir plus haut)
+def write_reports_merged(scenarios, output_path, generated_at, workers=None, task_size=DEFAULT_TASK_SIZE):
+    with open(output_path, "wb") as handle:
+        appender = _PdfAppender(handle)
+        for data in iter_rendered_reports(scenarios, generated_at, workers, task_size, merged=True):
+            appender.append(data)
+        return appender.close(generated_at)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génération en masse des rapports PDF de prêt immobilier.")
+    parser.add_argument("input", help="Fichier de scénarios (.csv ou .parquet)")
+    parser.add_argument("output", help="Archive .zip (un PDF par scénario) ou fichier .pdf unique")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus (défaut : nombre de cœurs)")
+    parser.add_argument("--task-size", type=int, default=DEFAULT_TASK_SIZE, help="Scénarios par tâche")
+    parser.add_argument("--date", default=None,
+                        help="Date de génération AAAA-MM-JJ inscrite dans les rapports (défaut : aujourd'hui)")
+    args = parser.parse_args(argv)
+
+    if args.date:
+        generated_at = datetime.strptime(args.date, "%Y-%m-%d")
+    else:
+        generated_at = datetime.combine(datetime.now().date(), datetime.min.time())
+    if args.output.lower().endswith(".pdf"):
+        count = write_reports_merged(args.input, args.output, generated_at, args.workers, args.task_size)
+    else:
+        count = write_reports_zip(args.input, args.output, generated_at, args.workers, args.task_size)
+    print(f"{count} rapports générés -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
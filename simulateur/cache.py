@@ -0,0 +1,138 @@
+# Mémoïsation des calculs purs entre les réexécutions Streamlit.
+#
+# Chaque fonction décorée par `memoize` possède un cache LRU borné (nombre d'entrées
+# maximal) avec une durée de vie optionnelle. Les caches sont enregistrés au niveau
+# du processus par nom de fonction : ils survivent aux réexécutions du script et sont
+# partagés entre toutes les sessions, comme st.cache_data, tout en exposant leurs
+# statistiques (succès, échecs, évictions).
+import hashlib
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+
+# Valeurs par défaut, réglables par variables d'environnement
+DEFAULT_MAX_ENTRIES = int(os.environ.get("SIMULATEUR_CACHE_MAX_ENTRIES", "128"))
+DEFAULT_TTL = float(os.environ.get("SIMULATEUR_CACHE_TTL", "3600")) or None
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class MemoCache:
+    def __init__(self, name, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Renvoie (trouvé, valeur) et met à jour les compteurs
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Clé de cache hachable à partir des arguments (les tableaux NumPy sont pris par valeur)
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        if value.ndim == 0:
+            return value.item()
+        return ("ndarray", value.dtype.str, value.shape, value.tobytes())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def make_key(args, kwargs):
+    return _freeze(args), _freeze(kwargs)
+
+
+# Décorateur de mémoïsation avec nombre d'entrées maximal et durée de vie (secondes)
+def memoize(max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, name=None):
+    def decorator(func):
+        cache_name = name or func.__qualname__
+        # Le bytecode (décorateurs retirés) fait partie de l'identifiant : modifier la fonction
+        # invalide son cache
+        code_hash = hashlib.sha1(inspect.unwrap(func).__code__.co_code).hexdigest()[:12]
+        registry_key = (func.__module__, cache_name, code_hash)
+        with _registry_lock:
+            cache = _registry.get(registry_key)
+            if cache is None:
+                cache = _registry[registry_key] = MemoCache(cache_name, max_entries, ttl)
+            cache.max_entries, cache.ttl = max_entries, ttl
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            found, value = cache.get(key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            cache.put(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+# Statistiques de tous les caches enregistrés
+def cache_stats():
+    with _registry_lock:
+        caches = list(_registry.values())
+    return [cache.stats() for cache in caches]
+
+
+def clear_caches():
+    with _registry_lock:
+        caches = list(_registry.values())
+    for cache in caches:
+        cache.clear()
@@ -0,0 +1,85 @@
+# Chiffres du rapport de prêt sous forme de graphe de dépendances (simulateur.graph).
+#
+# Mêmes formules et mêmes noms que engine.loan_report, pour un dossier unique (valeurs
+# scalaires), découpées en nœuds : changer le ratio net/brut ne recalcule que les revenus
+# bruts, changer l'assurance ne touche ni les frais de notaire ni la mensualité bancaire.
+from simulateur.engine import insurance_per_month, monthly_payment, required_income
+from simulateur.graph import DependencyGraph
+from simulateur.taeg import taeg
+
+# Paramètres d'entrée du graphe (mêmes noms que les arguments de loan_report)
+LOAN_PARAMS = [
+    "property_value", "interest_rate", "years", "down_payment", "debt_ratio", "net_to_gross_ratio",
+    "notary_fee_rate", "insurance_choice", "insurance_rate", "insurance_amount", "bank_fees", "guarantee_fees",
+]
+
+
+def loan_graph():
+    graph = DependencyGraph()
+
+    @graph.node("property_value", "notary_fee_rate")
+    def notary_fees(property_value, notary_fee_rate):
+        return property_value * notary_fee_rate / 100
+
+    @graph.node("property_value", "notary_fees")
+    def project_cost(property_value, notary_fees):
+        return property_value + notary_fees
+
+    @graph.node("project_cost", "down_payment")
+    def loan_required(project_cost, down_payment):
+        return bool(project_cost - down_payment > 0)
+
+    @graph.node("project_cost", "down_payment", "loan_required")
+    def loan_amount(project_cost, down_payment, loan_required):
+        return project_cost - down_payment if loan_required else 0.0
+
+    @graph.node("loan_amount", "interest_rate", "years")
+    def monthly_payment_bank(loan_amount, interest_rate, years):
+        return float(monthly_payment(loan_amount, interest_rate, years))
+
+    @graph.node("loan_amount", "loan_required", "insurance_choice", "insurance_rate", "insurance_amount",
+                name="insurance_per_month")
+    def insurance(loan_amount, loan_required, insurance_choice, insurance_rate, insurance_amount):
+        if not loan_required:
+            return 0.0
+        return float(insurance_per_month(loan_amount, insurance_choice, insurance_rate, insurance_amount))
+
+    @graph.node("monthly_payment_bank", "insurance_per_month", name="monthly_payment")
+    def total_monthly_payment(monthly_payment_bank, insurance_per_month):
+        return monthly_payment_bank + insurance_per_month
+
+    @graph.node("monthly_payment", "years")
+    def total_paid(monthly_payment, years):
+        return monthly_payment * years * 12
+
+    @graph.node("monthly_payment_bank", "loan_amount", "years")
+    def total_interest(monthly_payment_bank, loan_amount, years):
+        return monthly_payment_bank * years * 12 - loan_amount
+
+    # TAEG : frais de dossier et de garantie déduits du capital, assurance ajoutée aux échéances
+    @graph.node("loan_amount", "loan_required", "monthly_payment_bank", "years", "insurance_per_month", "bank_fees",
+                "guarantee_fees", name="taeg")
+    def effective_rate(loan_amount, loan_required, monthly_payment_bank, years, insurance_per_month, bank_fees,
+                       guarantee_fees):
+        if not loan_required:
+            return float("nan")
+        return float(taeg(loan_amount, monthly_payment_bank, years * 12, insurance_per_month, bank_fees,
+                          guarantee_fees))
+
+    @graph.node("monthly_payment", "debt_ratio")
+    def required_monthly_net_income(monthly_payment, debt_ratio):
+        return float(required_income(monthly_payment, debt_ratio, 1.0)["monthly_net"])
+
+    @graph.node("required_monthly_net_income")
+    def required_annual_net_income(required_monthly_net_income):
+        return required_monthly_net_income * 12
+
+    @graph.node("required_monthly_net_income", "net_to_gross_ratio")
+    def required_monthly_gross_income(required_monthly_net_income, net_to_gross_ratio):
+        return required_monthly_net_income / net_to_gross_ratio
+
+    @graph.node("required_monthly_gross_income")
+    def required_annual_gross_income(required_monthly_gross_income):
+        return required_monthly_gross_income * 12
+
+    return graph
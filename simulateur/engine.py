@@ -0,0 +1,122 @@
+# Moteur de calcul du prêt, indépendant de Streamlit.
+#
+# Toutes les fonctions acceptent des scalaires ou des tableaux NumPy (diffusion
+# "broadcasting") : un appel peut donc évaluer un seul scénario ou des millions.
+# Les taux sont exprimés en % annuel et les durées en années, comme dans l'interface.
+import numpy as np
+
+from simulateur.taeg import taeg
+
+
+# Taux mensuel à partir d'un taux annuel en %
+def monthly_rate(interest_rate):
+    return np.asarray(interest_rate, dtype=float) / 100 / 12
+
+
+# Facteur d'annuité r / (1 - (1 + r)^-n), avec la limite 1 / n quand r -> 0
+def annuity_factor(rate, months):
+    rate = np.asarray(rate, dtype=float)
+    months = np.asarray(months, dtype=float)
+    growth = -np.expm1(-months * np.log1p(rate))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = np.where(rate == 0, 1 / months, rate / growth)
+    return factor
+
+
+# Mensualité bancaire (hors assurance) d'un prêt amortissable
+def monthly_payment(principal, interest_rate, years):
+    months = np.asarray(years) * 12
+    return np.asarray(principal, dtype=float) * annuity_factor(monthly_rate(interest_rate), months)
+
+
+# Capital empruntable pour une mensualité donnée (inverse de monthly_payment)
+def principal_from_payment(payment, interest_rate, years):
+    months = np.asarray(years) * 12
+    return np.asarray(payment, dtype=float) / annuity_factor(monthly_rate(interest_rate), months)
+
+
+# Coût total du prêt : total payé (assurance incluse) et intérêts cumulés
+def total_cost(principal, interest_rate, years, monthly_insurance=0):
+    months = np.asarray(years) * 12
+    payment_bank = monthly_payment(principal, interest_rate, years)
+    total_paid = (payment_bank + monthly_insurance) * months
+    total_interest = payment_bank * months - principal
+    return {
+        "monthly_payment_bank": payment_bank,
+        "total_paid": total_paid,
+        "total_interest": total_interest,
+    }
+
+
+# Revenus nets et bruts requis pour une mensualité et un taux d'endettement donnés
+def required_income(monthly_payment, debt_ratio, net_to_gross_ratio):
+    monthly_net = np.asarray(monthly_payment, dtype=float) / debt_ratio
+    monthly_gross = monthly_net / net_to_gross_ratio
+    return {
+        "monthly_net": monthly_net,
+        "annual_net": monthly_net * 12,
+        "monthly_gross": monthly_gross,
+        "annual_gross": monthly_gross * 12,
+    }
+
+
+# Frais de notaire par défaut selon le type de bien (en % du prix), communs aux deux pages
+NOTARY_FEE_RATES = {"Ancien": 7.0, "Neuf": 1.0}
+
+# Choix d'assurance emprunteur proposés dans l'interface
+INSURANCE_NONE = "Aucune"
+INSURANCE_RATE = "Taux (%)"
+INSURANCE_FIXED = "Montant fixe (€)"
+INSURANCE_CHOICES = [INSURANCE_NONE, INSURANCE_RATE, INSURANCE_FIXED]
+
+
+# Assurance mensuelle selon le mode choisi (taux annuel sur le capital ou montant fixe)
+def insurance_per_month(loan_amount, insurance_choice, insurance_rate=0, insurance_amount=0):
+    choice = np.asarray(insurance_choice)
+    by_rate = np.asarray(loan_amount, dtype=float) * insurance_rate / 100 / 12
+    by_rate, fixed = np.broadcast_arrays(by_rate, np.asarray(insurance_amount, dtype=float))
+    return np.select([choice == INSURANCE_RATE, choice == INSURANCE_FIXED], [by_rate, fixed], default=0.0)
+
+
+# Calcul complet du rapport de prêt (mêmes chiffres que le rapport détaillé).
+# Les lignes dont l'apport couvre le projet ont loan_required à False et des montants nuls.
+def loan_report(property_value, interest_rate, years, down_payment, debt_ratio, net_to_gross_ratio,
+                notary_fee_rate, insurance_choice=INSURANCE_NONE, insurance_rate=0, insurance_amount=0,
+                bank_fees=0, guarantee_fees=0):
+    property_value = np.asarray(property_value, dtype=float)
+    notary_fees = property_value * notary_fee_rate / 100
+    project_cost = property_value + notary_fees
+    raw_loan_amount = project_cost - down_payment
+    loan_required = raw_loan_amount > 0
+    loan_amount = np.where(loan_required, raw_loan_amount, 0.0)
+
+    insurance = np.where(loan_required,
+                         insurance_per_month(loan_amount, insurance_choice, insurance_rate, insurance_amount), 0.0)
+    costs = total_cost(loan_amount, interest_rate, years, insurance)
+    monthly_payment_bank = costs["monthly_payment_bank"]
+    incomes = required_income(monthly_payment_bank + insurance, debt_ratio, net_to_gross_ratio)
+    # TAEG : frais de dossier et de garantie déduits du capital, assurance ajoutée aux échéances
+    # (calculé sur les seules lignes avec prêt : sans échéance, le taux n'est pas défini)
+    loan_rows = np.broadcast_arrays(loan_required, loan_amount, monthly_payment_bank, np.asarray(years) * 12,
+                                    insurance, np.asarray(bank_fees, dtype=float),
+                                    np.asarray(guarantee_fees, dtype=float))
+    required = loan_rows[0]
+    effective_rate = np.full(required.shape, np.nan)
+    effective_rate[required] = taeg(*(column[required] for column in loan_rows[1:]))
+
+    return {
+        "notary_fees": notary_fees,
+        "project_cost": project_cost,
+        "loan_required": loan_required,
+        "loan_amount": loan_amount,
+        "monthly_payment_bank": monthly_payment_bank,
+        "insurance_per_month": insurance,
+        "monthly_payment": monthly_payment_bank + insurance,
+        "total_paid": costs["total_paid"],
+        "total_interest": costs["total_interest"],
+        "taeg": effective_rate,
+        "required_monthly_net_income": incomes["monthly_net"],
+        "required_annual_net_income": incomes["annual_net"],
+        "required_monthly_gross_income": incomes["monthly_gross"],
+        "required_annual_gross_income": incomes["annual_gross"],
+    }
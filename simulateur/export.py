@@ -0,0 +1,120 @@
+# Export des tableaux en CSV, CSV compressé (gzip) ou Parquet, par blocs.
+#
+# Les tableaux sont fournis sous forme de suites de DataFrames (générateurs) et écrits bloc
+# par bloc : un fichier de plusieurs dizaines de millions de lignes (100 000 tableaux
+# d'amortissement de 360 mois, par exemple) est produit avec une mémoire constante. Les
+# octets d'un téléchargement ne sont produits qu'à la demande (to_bytes).
+import gzip
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from simulateur.amortization import SCHEDULE_COLUMNS, amortization_arrays
+from simulateur.profiling import instrument
+
+DEFAULT_CHUNKSIZE = 100_000
+DEFAULT_LOANS_PER_CHUNK = 1_000
+
+# Format -> type MIME du fichier produit
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "csv.gz": "application/gzip",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as exc:
+        raise ImportError("Le format Parquet nécessite le paquet 'pyarrow' (pip install pyarrow).") from exc
+    return pyarrow
+
+
+# Format déduit de l'extension du fichier (.csv, .csv.gz, .parquet ou .pq)
+def file_format(path):
+    name = str(path).lower()
+    if name.endswith((".parquet", ".pq")):
+        return "parquet"
+    if name.endswith(".gz"):
+        return "csv.gz"
+    return "csv"
+
+
+# Découpe un DataFrame en blocs de `chunksize` lignes ; une suite de DataFrames est renvoyée telle quelle
+def iter_frames(frames, chunksize=DEFAULT_CHUNKSIZE):
+    if isinstance(frames, pd.DataFrame):
+        return (frames.iloc[start:start + chunksize] for start in range(0, max(len(frames), 1), chunksize))
+    return iter(frames)
+
+
+# Écrit une suite de DataFrames dans un fichier (chemin ou objet binaire) et renvoie le nombre de lignes
+def write_frames(frames, target, export_format=None, chunksize=DEFAULT_CHUNKSIZE):
+    export_format = export_format or file_format(target)
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {export_format!r} (attendu : {', '.join(EXPORT_FORMATS)})")
+    rows = 0
+    if export_format == "parquet":
+        pa = require_pyarrow()
+        writer = None
+        try:
+            for frame in iter_frames(frames, chunksize):
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pa.parquet.ParquetWriter(target, table.schema)
+                writer.write_table(table.cast(writer.schema))
+                rows += len(frame)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    handle = open(target, "wb") if isinstance(target, (str, os.PathLike)) else target
+    # mtime fixé : deux exports identiques produisent les mêmes octets
+    stream = gzip.GzipFile(fileobj=handle, mode="wb", mtime=0) if export_format == "csv.gz" else handle
+    try:
+        for index, frame in enumerate(iter_frames(frames, chunksize)):
+            stream.write(frame.to_csv(index=False, header=index == 0).encode("utf-8"))
+            rows += len(frame)
+    finally:
+        if stream is not handle:
+            stream.close()
+        if handle is not target:
+            handle.close()
+    return rows
+
+
+# Octets du fichier exporté, pour un bouton de téléchargement (à passer via functools.partial
+# pour n'exporter qu'au clic)
+@instrument()
+def to_bytes(frames, export_format="csv", chunksize=DEFAULT_CHUNKSIZE):
+    buffer = io.BytesIO()
+    write_frames(frames, buffer, export_format, chunksize)
+    return buffer.getvalue()
+
+
+# Tableaux d'amortissement de nombreux prêts, par blocs de `loans_per_chunk` prêts.
+# Chaque bloc est un DataFrame long (colonne "Prêt" puis colonnes du tableau d'amortissement) ;
+# les prêts de durées différentes sont regroupés par durée à l'intérieur de chaque bloc.
+def iter_schedules(loan_amounts, interest_rates, years, monthly_insurance=0.0, loan_ids=None,
+                   loans_per_chunk=DEFAULT_LOANS_PER_CHUNK):
+    loan_amounts = np.atleast_1d(np.asarray(loan_amounts, dtype=float))
+    interest_rates, years, monthly_insurance = (
+        np.broadcast_to(values, loan_amounts.shape) for values in (interest_rates, years, monthly_insurance)
+    )
+    loan_ids = np.arange(1, loan_amounts.size + 1) if loan_ids is None else np.asarray(loan_ids)
+
+    for start in range(0, loan_amounts.size, loans_per_chunk):
+        chunk = slice(start, start + loans_per_chunk)
+        for term in np.unique(years[chunk]):
+            selected = np.flatnonzero(years[chunk] == term) + start
+            arrays = amortization_arrays(loan_amounts[selected], interest_rates[selected], term,
+                                         monthly_insurance[selected])
+            months = arrays["Mois"].size
+            frame = {"Prêt": np.repeat(loan_ids[selected], months), "Mois": np.tile(arrays["Mois"], selected.size)}
+            for column in SCHEDULE_COLUMNS[1:]:
+                frame[column] = np.ravel(arrays[column])
+            yield pd.DataFrame(frame, columns=["Prêt"] + SCHEDULE_COLUMNS)
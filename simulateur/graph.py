@@ -0,0 +1,99 @@
+# Graphe de dépendances des valeurs dérivées, recalculées de façon incrémentale.
+#
+# Chaque nœud est une fonction pure dont les arguments sont des paramètres (valeurs d'entrée)
+# ou d'autres nœuds. Un état (GraphState, un par session) conserve pour chaque nœud sa dernière
+# valeur, la clé des entrées qui l'ont produite et un numéro de version. À chaque exécution :
+#     - un nœud n'est évalué que s'il est demandé (évaluation paresseuse) ;
+#     - il n'est recalculé que si l'un de ses paramètres ou la version d'un nœud amont a changé ;
+#     - un nœud recalculé dont la valeur scalaire est inchangée garde sa version : ses
+#       dépendants ne sont pas recalculés (coupure anticipée).
+# L'évaluation liste les nœuds recalculés et réutilisés ; chaque calcul est une étape mesurée
+# (simulateur.profiling).
+import hashlib
+import inspect
+import itertools
+
+import numpy as np
+
+from simulateur.cache import make_key
+from simulateur.profiling import span
+
+_SCALARS = (bool, int, float, str, np.number, np.bool_)
+
+
+class DependencyGraph:
+    def __init__(self):
+        self.nodes = {}
+
+    # Décorateur : déclare un nœud calculé à partir des entrées nommées (paramètres ou nœuds).
+    # Le bytecode de la fonction (décorateurs retirés) fait partie de la clé : la modifier
+    # invalide le nœud.
+    def node(self, *inputs, name=None):
+        def decorator(func):
+            code_hash = hashlib.sha1(inspect.unwrap(func).__code__.co_code).hexdigest()[:12]
+            self.nodes[name or func.__name__] = (func, inputs, code_hash)
+            return func
+
+        return decorator
+
+    # Évaluation paresseuse du graphe pour des paramètres, avec l'état conservé entre exécutions
+    def evaluate(self, state, **params):
+        return Evaluation(self, state, params)
+
+
+class GraphState:
+    def __init__(self):
+        # nom du nœud -> (clé des entrées, valeur, version)
+        self.entries = {}
+        self.versions = itertools.count(1)
+
+
+def _unchanged(previous, value):
+    return isinstance(previous, _SCALARS) and isinstance(value, _SCALARS) and previous == value
+
+
+class Evaluation:
+    def __init__(self, graph, state, params):
+        self.graph = graph
+        self.state = state
+        self.params = dict(params)
+        self.recomputed = []
+        self.reused = []
+        self._versions = {}
+
+    # Paramètres connus plus tard dans l'exécution (widgets d'un onglet)
+    def provide(self, **params):
+        self.params.update(params)
+
+    def __getitem__(self, name):
+        if name in self.params:
+            return self.params[name]
+        self._evaluate(name)
+        return self.state.entries[name][1]
+
+    def _input_key(self, name):
+        if name in self.params:
+            return make_key((self.params[name],), {})
+        return self._evaluate(name)
+
+    # Évalue un nœud (une fois par exécution) et renvoie sa version
+    def _evaluate(self, name):
+        version = self._versions.get(name)
+        if version is not None:
+            return version
+        if name not in self.graph.nodes:
+            raise KeyError(f"Valeur inconnue du graphe : {name!r}")
+        func, inputs, code_hash = self.graph.nodes[name]
+        key = (code_hash,) + tuple(self._input_key(item) for item in inputs)
+        entry = self.state.entries.get(name)
+        if entry is not None and entry[0] == key:
+            version = entry[2]
+            self.reused.append(name)
+        else:
+            with span(name):
+                value = func(*(self[item] for item in inputs))
+            self.recomputed.append(name)
+            version = entry[2] if entry is not None and _unchanged(entry[1], value) else next(self.state.versions)
+            self.state.entries[name] = (key, value, version)
+        self._versions[name] = version
+        return version
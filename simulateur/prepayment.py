@@ -0,0 +1,217 @@
+# Remboursements anticipés pilotés par événements.
+#
+# Un événement est un versement ponctuel ou un versement mensuel récurrent (avec mois de
+# début et de fin), versé en plus de l'échéance du mois. Après chaque événement, le prêt
+# garde sa mensualité et se termine plus tôt (mode "durée") ou garde sa date de fin et voit
+# sa mensualité recalculée (mode "mensualité").
+#
+# Entre deux événements, le versement mensuel est constant et le solde est avancé par la
+# formule fermée B_k = B (1 + r)^k - Q ((1 + r)^k - 1) / r ; le mois de solde nul est obtenu
+# en inversant cette formule. Le coût est donc proportionnel au nombre d'événements et non
+# au nombre de mois, et le tableau mois par mois n'est construit que sur demande.
+#
+# Avec une règle d'arrondi (`rounding`), la simulation passe par le mode arrondi bancaire de
+# simulateur.bank_exact : calcul mois par mois en centimes entiers, comme l'offre de prêt.
+import math
+
+import numpy as np
+import pandas as pd
+
+from simulateur.amortization import SCHEDULE_COLUMNS
+from simulateur.bank_exact import END_PAYMENT, END_TERM, bank_schedule_arrays, to_cents
+
+MODE_TERM = "durée"
+MODE_PAYMENT = "mensualité"
+PREPAYMENT_MODES = [MODE_TERM, MODE_PAYMENT]
+
+
+# Versement ponctuel payé avec l'échéance du mois `month`
+def lump_sum(month, amount, mode=MODE_TERM):
+    return {"start": int(month), "end": int(month), "amount": float(amount), "mode": mode}
+
+
+# Versement ajouté à chaque échéance de `start` à `end` inclus (jusqu'à la fin du prêt si end est None)
+def recurring_payment(amount, start, end=None, mode=MODE_TERM):
+    return {"start": int(start), "end": None if end is None else int(end), "amount": float(amount), "mode": mode}
+
+
+def _annuity_factor(rate, months):
+    if rate == 0:
+        return 1 / months
+    return rate / -math.expm1(-months * math.log1p(rate))
+
+
+# Solde après `months` échéances de montant `outflow`
+def _balance_after(balance, outflow, rate, months):
+    if rate == 0:
+        return balance - outflow * months
+    growth = math.expm1(months * math.log1p(rate))
+    return balance + balance * growth - outflow * growth / rate
+
+
+# Nombre d'échéances de montant `outflow` nécessaires pour solder `balance` (inf si jamais)
+def _months_to_payoff(balance, outflow, rate):
+    if balance <= 0:
+        return 0
+    if outflow <= balance * rate:
+        return math.inf
+    if rate == 0:
+        exact = balance / outflow
+    else:
+        exact = math.log(outflow / (outflow - balance * rate)) / math.log1p(rate)
+    # Tolérance sur les erreurs d'arrondi : 239.9999999 et 240.0000001 donnent 240
+    return max(1, math.ceil(exact - 1e-7))
+
+
+def _check_events(events, months):
+    for event in events:
+        if event["mode"] not in PREPAYMENT_MODES:
+            raise ValueError(f"Mode inconnu : {event['mode']!r} (attendu : {', '.join(PREPAYMENT_MODES)})")
+        end = months if event["end"] is None else event["end"]
+        if not 1 <= event["start"] <= end <= months:
+            raise ValueError(f"Événement hors de la durée du prêt (mois 1 à {months}) : {event}")
+        if event["amount"] < 0:
+            raise ValueError(f"Montant de versement négatif : {event}")
+
+
+# Lignes du tableau d'amortissement pour `count` échéances de montant `outflow` à partir du mois `first_month`.
+# La dernière échéance est ramenée au solde restant si `final` est vrai.
+def _segment_rows(first_month, balance, outflow, rate, count, monthly_insurance, final):
+    k = np.arange(count, dtype=float)
+    if rate == 0:
+        balances = balance - outflow * k
+    else:
+        growth = np.expm1(k * np.log1p(rate))
+        balances = balance + balance * growth - outflow * growth / rate
+    interest = balances * rate
+    payments = np.full(count, outflow)
+    if final:
+        payments[-1] = balances[-1] + interest[-1]
+    principal = payments - interest
+    return {
+        "Mois": np.arange(first_month, first_month + count),
+        "Mensualité": payments + monthly_insurance,
+        "Capital": principal,
+        "Intérêt": interest,
+        "Assurance": np.full(count, float(monthly_insurance)),
+        "Solde restant": np.maximum(balances - principal, 0),
+    }
+
+
+# Simulation en centimes entiers : le prêt sans remboursement anticipé (ligne 0) et le prêt
+# avec les événements (ligne 1) sont calculés dans le même lot
+def _bank_prepayments(loan_amount, interest_rate, years, events, monthly_insurance, schedule, rounding,
+                      payment_rounding):
+    months = int(years * 12)
+    extra_payments = np.zeros((2, months), dtype=np.int64)
+    event_ends = np.zeros((2, months), dtype=np.int8)
+    for event in events:
+        end = months if event["end"] is None else event["end"]
+        extra_payments[1, event["start"] - 1:end] += to_cents(event["amount"], payment_rounding or rounding)
+        if event["end"] is not None:
+            event_ends[1, end - 1] |= END_TERM if event["mode"] == MODE_TERM else END_PAYMENT
+    arrays = bank_schedule_arrays(np.full(2, float(loan_amount)), interest_rate, years, monthly_insurance,
+                                  extra_payments, event_ends, rounding, payment_rounding)
+    paid_months = int(arrays["months"][1])
+    baseline_interest, total_interest = arrays["Intérêt"].sum(axis=1).tolist()
+    result = {
+        "months": paid_months,
+        "months_saved": months - paid_months,
+        "total_paid": int(arrays["Mensualité"][1].sum()) / 100,
+        "total_interest": total_interest / 100,
+        "interest_saved": (baseline_interest - total_interest) / 100,
+        "total_insurance": int(arrays["Assurance"][1].sum()) / 100,
+        "final_payment": int(arrays["final_payment"][1]) / 100,
+    }
+    if schedule:
+        columns = {"Mois": arrays["Mois"][:paid_months]}
+        for column in SCHEDULE_COLUMNS[1:]:
+            columns[column] = arrays[column][1, :paid_months] / 100
+        result["schedule"] = pd.DataFrame(columns, columns=SCHEDULE_COLUMNS)
+    return result
+
+
+# Simule un prêt avec une liste d'événements de remboursement anticipé.
+# Renvoie la durée effective, les mois et intérêts économisés par rapport au prêt sans
+# remboursement anticipé, les totaux et la mensualité bancaire finale ; le tableau
+# d'amortissement (clé "schedule") n'est calculé que si schedule=True. Avec une règle
+# d'arrondi (`rounding`, voir simulateur.bank_exact), les montants sont arrondis au centime.
+def simulate_prepayments(loan_amount, interest_rate, years, events=(), monthly_insurance=0.0, schedule=False,
+                         rounding=None, payment_rounding=None):
+    months = int(years * 12)
+    rate = interest_rate / 100 / 12
+    events = list(events)
+    _check_events(events, months)
+    if rounding is not None:
+        return _bank_prepayments(loan_amount, interest_rate, years, events, monthly_insurance, schedule, rounding,
+                                 payment_rounding)
+
+    initial_payment = loan_amount * _annuity_factor(rate, months)
+    boundaries = {1, months + 1}
+    for event in events:
+        boundaries.add(event["start"])
+        if event["end"] is not None:
+            boundaries.add(event["end"] + 1)
+    boundaries = sorted(boundaries)
+
+    balance = float(loan_amount)
+    payment = initial_payment
+    end_month = months
+    paid = 0.0
+    paid_months = 0
+    segments = []
+    for first_month, next_boundary in zip(boundaries, boundaries[1:]):
+        length = next_boundary - first_month
+        extra = sum(event["amount"] for event in events
+                    if event["start"] <= first_month and (event["end"] is None or event["end"] >= first_month))
+        outflow = payment + extra
+        payoff = _months_to_payoff(balance, outflow, rate)
+        if payoff <= length or next_boundary > months:
+            # Fin du prêt dans ce segment : la dernière échéance solde le capital restant
+            count = min(payoff, length)
+            last_balance = _balance_after(balance, outflow, rate, count - 1)
+            paid += (count - 1) * outflow + last_balance * (1 + rate)
+            paid_months = first_month + count - 1
+            if schedule:
+                segments.append(_segment_rows(first_month, balance, outflow, rate, count, monthly_insurance, True))
+            balance = 0.0
+            break
+
+        if schedule:
+            segments.append(_segment_rows(first_month, balance, outflow, rate, length, monthly_insurance, False))
+        balance = _balance_after(balance, outflow, rate, length)
+        paid += length * outflow
+        # À la fin d'un événement, le mode "durée" avance la date de fin prévue et le mode
+        # "mensualité" recalcule la mensualité pour finir à la date prévue
+        ending = {event["mode"] for event in events if event["end"] == next_boundary - 1}
+        if MODE_TERM in ending:
+            end_month = min(months, next_boundary - 1 + _months_to_payoff(balance, payment, rate))
+        if MODE_PAYMENT in ending:
+            payment = balance * _annuity_factor(rate, max(1, end_month - next_boundary + 1))
+
+    baseline_interest = initial_payment * months - loan_amount
+    total_interest = paid - loan_amount
+    result = {
+        "months": paid_months,
+        "months_saved": months - paid_months,
+        "total_paid": paid + monthly_insurance * paid_months,
+        "total_interest": total_interest,
+        "interest_saved": baseline_interest - total_interest,
+        "total_insurance": monthly_insurance * paid_months,
+        "final_payment": payment,
+    }
+    if schedule:
+        columns = {column: np.concatenate([segment[column] for segment in segments]) for column in SCHEDULE_COLUMNS}
+        result["schedule"] = pd.DataFrame(columns, columns=SCHEDULE_COLUMNS)
+    return result
+
+
+# Compare des stratégies de remboursement anticipé pour un même prêt (dictionnaire nom -> événements),
+# classées de la plus forte à la plus faible économie d'intérêts.
+def rank_strategies(loan_amount, interest_rate, years, strategies, monthly_insurance=0.0):
+    summaries = {
+        name: simulate_prepayments(loan_amount, interest_rate, years, events, monthly_insurance)
+        for name, events in strategies.items()
+    }
+    ranking = pd.DataFrame.from_dict(summaries, orient="index")
+    return ranking.sort_values(["interest_saved", "months_saved"], ascending=False)
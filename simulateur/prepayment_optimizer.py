@@ -0,0 +1,173 @@
+# Recherche du meilleur plan de remboursement anticipé sous contrainte de trésorerie.
+#
+# Un plan combine un versement mensuel complémentaire (à partir d'un mois de début, jusqu'à
+# la fin du prêt), un versement ponctuel et le mode appliqué après chaque versement (réduction
+# de durée ou de mensualité). Les plans candidats sont évalués par lots : les tableaux NumPy
+# portent un plan par ligne et seuls les mois sont parcourus, une fois pour tout le lot.
+#
+# Patrimoine net : chaque mois, le ménage dispose de la mensualité initiale (assurance
+# comprise) plus le budget mensuel ; ce qui ne sert pas au prêt est placé au rendement
+# alternatif, tout comme l'enveloppe de versement ponctuel tant qu'elle n'est pas utilisée.
+# Le patrimoine est mesuré à la fin de la durée initiale du prêt.
+#
+# Élagage : les intérêts diminuent quand les versements augmentent, l'objectif "intérêts"
+# n'évalue donc que les plans qui utilisent tout le budget. Pour le patrimoine, une grille
+# grossière est évaluée puis affinée autour des meilleurs plans seulement.
+import itertools
+
+import numpy as np
+
+from simulateur.engine import annuity_factor
+from simulateur.prepayment import MODE_PAYMENT, PREPAYMENT_MODES, lump_sum, recurring_payment, simulate_prepayments
+
+OBJECTIVES = ["interest", "net_worth"]
+DEFAULT_BATCH_SIZE = 50_000
+_REFINED_PLANS = 5
+
+
+# Évalue des plans (un par ligne) mois par mois, vectorisé sur les plans.
+# Renvoie la durée effective, les intérêts totaux et le patrimoine net de chaque plan.
+def evaluate_plans(loan_amount, interest_rate, years, extra_payment, start_month, lump_amount, lump_month,
+                   reduce_payment, monthly_budget=0.0, lump_sum_budget=0.0, investment_return=0.0,
+                   monthly_insurance=0.0):
+    months = int(years * 12)
+    rate = interest_rate / 100 / 12
+    growth = (1 + investment_return / 100) ** (1 / 12)
+    extra_payment, start_month, lump_amount, lump_month, reduce_payment = np.broadcast_arrays(
+        np.asarray(extra_payment, dtype=float), start_month, np.asarray(lump_amount, dtype=float), lump_month,
+        reduce_payment)
+    initial_payment = loan_amount * float(annuity_factor(rate, months))
+    cash_available = initial_payment + monthly_insurance + monthly_budget
+
+    balance = np.full(extra_payment.shape, float(loan_amount))
+    payment = np.full(extra_payment.shape, initial_payment)
+    total_interest = np.zeros(extra_payment.shape)
+    paid_months = np.full(extra_payment.shape, months)
+    wealth = np.full(extra_payment.shape, float(lump_sum_budget))
+    for month in range(1, months + 1):
+        active = balance > 0
+        interest = balance * rate
+        due = balance + interest
+        outflow = payment + np.where(month >= start_month, extra_payment, 0) + np.where(month == lump_month, lump_amount, 0)
+        outflow = np.minimum(outflow, due)
+        total_interest += interest
+        balance = due - outflow
+        # Le dernier mois absorbe les résidus d'arrondi
+        finished = active & (balance <= 1e-6 * loan_amount)
+        balance[finished] = 0.0
+        paid_months[finished] = month
+        wealth = wealth * growth + cash_available - outflow - np.where(active, monthly_insurance, 0)
+
+        recompute = reduce_payment & (lump_amount > 0) & (month == lump_month) & (balance > 0) & (month < months)
+        if recompute.any():
+            payment[recompute] = balance[recompute] * float(annuity_factor(rate, months - month))
+
+    return {"months": paid_months, "total_interest": total_interest, "net_worth": wealth}
+
+
+def _grid(upper, step):
+    if upper <= 0:
+        return np.zeros(1)
+    return np.unique(np.append(np.arange(0, upper, step), upper))
+
+
+# Plans distincts. Sans versement mensuel, le mois de début est sans effet ; sans versement
+# ponctuel, son mois et le mode (appliqué après le versement ponctuel) le sont aussi : ces plans
+# ne sont gardés qu'une fois, en réduction de durée.
+def _distinct(candidates):
+    candidates = np.array(candidates, dtype=float)
+    candidates[candidates[:, 0] == 0, 1] = 1
+    candidates[candidates[:, 2] == 0, 3:] = [1, 0]
+    return np.unique(candidates, axis=0)
+
+
+def _evaluate(candidates, objective, batch_size, **params):
+    scores = []
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start:start + batch_size]
+        result = evaluate_plans(params["loan_amount"], params["interest_rate"], params["years"],
+                                batch[:, 0], batch[:, 1], batch[:, 2], batch[:, 3], batch[:, 4].astype(bool),
+                                params["monthly_budget"], params["lump_sum_budget"], params["investment_return"],
+                                params["monthly_insurance"])
+        # Départage : à intérêts égaux, le patrimoine le plus élevé
+        if objective == "interest":
+            scores.append(-result["total_interest"] + 1e-9 * result["net_worth"])
+        else:
+            scores.append(result["net_worth"])
+    return np.concatenate(scores)
+
+
+# Cherche le plan qui minimise les intérêts totaux (objective="interest") ou maximise le
+# patrimoine net (objective="net_worth") sous un budget mensuel et une enveloppe de versement
+# ponctuel. Renvoie les événements du plan retenu, son résumé (simulate_prepayments), son
+# patrimoine net, le gain par rapport à l'absence de remboursement anticipé et le nombre de
+# plans évalués.
+def optimize_prepayment(loan_amount, interest_rate, years, monthly_budget, lump_sum_budget=0.0,
+                        investment_return=0.0, objective="interest", modes=PREPAYMENT_MODES, month_step=12,
+                        amount_step=None, monthly_insurance=0.0, batch_size=DEFAULT_BATCH_SIZE):
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Objectif inconnu : {objective!r} (attendu : {', '.join(OBJECTIVES)})")
+    months = int(years * 12)
+    params = {
+        "loan_amount": loan_amount, "interest_rate": interest_rate, "years": years,
+        "monthly_budget": monthly_budget, "lump_sum_budget": lump_sum_budget,
+        "investment_return": investment_return, "monthly_insurance": monthly_insurance,
+    }
+    amount_step = amount_step or max(monthly_budget, lump_sum_budget, 1) / 4
+    # Les mois de début ne sont explorés que pour les versements qui existent
+    starts = np.arange(1, months + 1, month_step) if monthly_budget > 0 else np.ones(1)
+    lump_months = np.arange(1, months + 1, month_step) if lump_sum_budget > 0 else np.ones(1)
+    reduce_flags = sorted({mode == MODE_PAYMENT for mode in modes})
+
+    if objective == "interest":
+        extras, lumps = [monthly_budget], [lump_sum_budget]
+    else:
+        extras, lumps = _grid(monthly_budget, amount_step), _grid(lump_sum_budget, amount_step)
+    candidates = _distinct(list(itertools.product(extras, starts, lumps, lump_months, reduce_flags)))
+    scores = _evaluate(candidates, objective, batch_size, **params)
+    evaluated = len(candidates)
+
+    # Affinage autour des meilleurs plans : mois au mois près, puis montants au quart de pas
+    for phase in ("months", "amounts"):
+        refined = []
+        for extra, start, lump, lump_at, reduce in candidates[np.argsort(scores)[-_REFINED_PLANS:]]:
+            if phase == "months":
+                window = np.arange(1 - month_step, month_step)
+                axes = ([extra], np.clip(start + window, 1, months) if monthly_budget > 0 else [start], [lump],
+                        np.clip(lump_at + window, 1, months) if lump_sum_budget > 0 else [lump_at], [reduce])
+            elif objective == "net_worth":
+                window = np.linspace(-amount_step, amount_step, 9)
+                axes = (np.clip(extra + window, 0, monthly_budget), [start], np.clip(lump + window, 0, lump_sum_budget),
+                        [lump_at], [reduce])
+            else:
+                continue
+            refined.extend(itertools.product(*(np.unique(axis) for axis in axes)))
+        if not refined:
+            continue
+        refined = _distinct(refined)
+        candidates = np.concatenate([candidates, refined])
+        scores = np.concatenate([scores, _evaluate(refined, objective, batch_size, **params)])
+        evaluated += len(refined)
+
+    extra, start, lump, lump_at, reduce = candidates[np.argmax(scores)]
+    mode = MODE_PAYMENT if reduce else PREPAYMENT_MODES[0]
+    events = []
+    if extra > 0:
+        events.append(recurring_payment(extra, start, mode=mode))
+    if lump > 0:
+        events.append(lump_sum(lump_at, lump, mode=mode))
+    else:
+        # Sans versement ponctuel, aucun mode n'est appliqué (le versement mensuel court jusqu'au bout)
+        mode = None
+
+    worth = evaluate_plans(loan_amount, interest_rate, years, [extra, 0], start, [lump, 0], lump_at, bool(reduce),
+                           monthly_budget, lump_sum_budget, investment_return, monthly_insurance)["net_worth"]
+    result = simulate_prepayments(loan_amount, interest_rate, years, events, monthly_insurance)
+    result.update({
+        "events": events,
+        "mode": mode,
+        "net_worth": float(worth[0]),
+        "net_worth_gain": float(worth[0] - worth[1]),
+        "evaluated": evaluated,
+    })
+    return result
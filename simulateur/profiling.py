@@ -0,0 +1,206 @@
+# Instrumentation des exécutions : durée et mémoire des étapes de calcul et de rendu.
+#
+# Une étape est mesurée par `span(nom)` (gestionnaire de contexte) ou `instrument()`
+# (décorateur). Les étapes s'emboîtent : le profil d'une réexécution Streamlit est l'arbre
+# des étapes ouvertes entre `begin_rerun` et `end_rerun`, avec pour chacune le temps total,
+# le temps propre (hors sous-étapes) et, si tracemalloc est actif, la mémoire nette allouée
+# et la hausse du pic. La pile des étapes est propre à chaque fil d'exécution (une session
+# Streamlit).
+#
+# tracemalloc est un réglage du processus, pas d'une session : il est démarré une fois au
+# chargement du module si SIMULATEUR_TRACEMALLOC est défini (ou par PYTHONTRACEMALLOC), et
+# les étapes se contentent de lire les compteurs sans jamais les remettre à zéro. Le pic est
+# celui du processus : une étape en retient la hausse pendant son exécution. Les mesures
+# mémoire englobent les allocations des sessions concurrentes ; à lire sur un serveur peu chargé.
+#
+# Toutes les durées alimentent aussi des métriques du processus (p50, p99 sur les dernières
+# mesures), exportables au format texte Prometheus ; chaque réexécution peut être journalisée
+# en JSONL. Réglages par variables d'environnement :
+#     SIMULATEUR_TRACEMALLOC   active le suivi des allocations (ralentit sensiblement le script)
+#     SIMULATEUR_METRICS_LOG   fichier JSONL, une ligne par réexécution
+#     SIMULATEUR_METRICS_FILE  fichier texte Prometheus réécrit à chaque réexécution
+#                              (collecteur « textfile » de node_exporter)
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+
+import numpy as np
+
+METRICS_LOG = os.environ.get("SIMULATEUR_METRICS_LOG")
+METRICS_FILE = os.environ.get("SIMULATEUR_METRICS_FILE")
+TRACE_MEMORY = bool(os.environ.get("SIMULATEUR_TRACEMALLOC"))
+# Nombre de mesures conservées par étape pour le calcul des quantiles
+SAMPLE_SIZE = 1024
+QUANTILES = (0.5, 0.9, 0.99)
+
+_current = ContextVar("simulateur_span", default=None)
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+if TRACE_MEMORY and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+class _Metric:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+
+class Span:
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.path = f"{parent.path}/{name}" if parent is not None else name
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.children = []
+        self.seconds = 0.0
+        self.child_seconds = 0.0
+        self.allocated = None
+        self.peak = None
+        self._start_memory = None
+        self._start_peak = 0
+
+    def start(self):
+        if tracemalloc.is_tracing():
+            self._start_memory, self._start_peak = tracemalloc.get_traced_memory()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        self.seconds = time.perf_counter() - self._started
+        if self._start_memory is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            self.allocated = current - self._start_memory
+            self.peak = peak - self._start_peak
+        if self.parent is not None:
+            self.parent.children.append(self)
+            self.parent.child_seconds += self.seconds
+        record(self.name, self.seconds)
+
+    # Étapes de l'arbre en profondeur d'abord, dans l'ordre d'exécution
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self):
+        return {
+            "span": self.path,
+            "depth": self.depth,
+            "seconds": self.seconds,
+            "self_seconds": self.seconds - self.child_seconds,
+            "allocated": self.allocated,
+            "peak": self.peak,
+        }
+
+
+# Mesure d'une étape, emboîtée dans l'étape en cours s'il y en a une
+@contextmanager
+def span(name):
+    current = Span(name, _current.get())
+    token = _current.set(current)
+    current.start()
+    try:
+        yield current
+    finally:
+        current.stop()
+        _current.reset(token)
+
+
+# Décorateur : chaque appel de la fonction est une étape (nom de la fonction par défaut)
+def instrument(name=None):
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Ajoute une durée (secondes) aux métriques de l'étape `name`
+def record(name, seconds):
+    with _metrics_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = _Metric()
+        metric.count += 1
+        metric.total += seconds
+        metric.samples.append(seconds)
+
+
+# Ouvre l'étape racine d'une réexécution
+def begin_rerun(name):
+    root = Span(name)
+    root._token = _current.set(root)
+    root.start()
+    return root
+
+
+# Ferme l'étape racine, journalise la réexécution et renvoie la liste des étapes
+def end_rerun(root):
+    root.stop()
+    _current.reset(root._token)
+    spans = [item.to_dict() for item in root.walk()]
+    if METRICS_LOG:
+        line = {"time": datetime.now().isoformat(timespec="milliseconds"), "rerun": root.name,
+                "seconds": root.seconds, "spans": spans}
+        with open(METRICS_LOG, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(line, ensure_ascii=False) + "\n")
+    if METRICS_FILE:
+        write_prometheus(METRICS_FILE)
+    return spans
+
+
+def _snapshot():
+    with _metrics_lock:
+        snapshot = {name: (metric.count, metric.total, np.array(metric.samples)) for name, metric in _metrics.items()}
+    return sorted(snapshot.items())
+
+
+# Nombre d'appels, durée moyenne et quantiles de chaque étape
+def metrics_summary():
+    summary = []
+    for name, (count, total, samples) in _snapshot():
+        row = {"span": name, "count": count, "mean": total / count}
+        for quantile, value in zip(QUANTILES, np.quantile(samples, QUANTILES)):
+            row[f"p{round(quantile * 100)}"] = float(value)
+        summary.append(row)
+    return summary
+
+
+def clear_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+# Métriques au format texte Prometheus (un résumé par étape, en secondes)
+def prometheus_text(prefix="simulateur_span_seconds"):
+    lines = [f"# HELP {prefix} Durée des étapes de calcul et de rendu du simulateur.", f"# TYPE {prefix} summary"]
+    for name, (count, total, samples) in _snapshot():
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        for quantile, value in zip(QUANTILES, np.quantile(samples, QUANTILES)):
+            lines.append(f'{prefix}{{span="{label}",quantile="{quantile:g}"}} {value:.9g}')
+        lines.append(f'{prefix}_sum{{span="{label}"}} {total:.9g}')
+        lines.append(f'{prefix}_count{{span="{label}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+# Réécrit le fichier de métriques de façon atomique (lu à tout moment par le collecteur)
+def write_prometheus(path):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        handle.write(prometheus_text())
+    os.replace(temporary, path)
@@ -0,0 +1,146 @@
+# Montage à plusieurs prêts : prêt principal, PTZ, prêt Action Logement, etc.
+#
+# Chaque ligne de prêt peut avoir un différé (partiel : intérêts payés ; total : intérêts
+# capitalisés) avant d'être amortie à échéances constantes. Le prêt lissé, s'il y en a un,
+# voit ses échéances calculées pour que la mensualité totale du montage reste constante sur
+# sa durée : il paie moins tant que les autres prêts sont remboursés et plus ensuite.
+#
+# Toutes les lignes sont calculées ensemble dans des tableaux de forme (lignes, mois). Le
+# solde d'une ligne est B_t = (1 + r)^t (L - somme des p_s (1 + r)^-s, s <= t), obtenu par
+# une somme cumulée, et la mensualité lissée par une formule fermée sur les valeurs actualisées.
+import numpy as np
+import pandas as pd
+
+DEFERRAL_PARTIAL = "partiel"
+DEFERRAL_TOTAL = "total"
+DEFERRAL_TYPES = [DEFERRAL_PARTIAL, DEFERRAL_TOTAL]
+
+
+# Ligne de prêt du montage (taux en % annuel, durée en années, différé inclus dans la durée)
+def loan_line(name, amount, interest_rate, years, deferral_months=0, deferral_type=DEFERRAL_PARTIAL,
+              monthly_insurance=0.0, smoothed=False):
+    return {
+        "name": name,
+        "amount": float(amount),
+        "interest_rate": float(interest_rate),
+        "years": years,
+        "deferral_months": int(deferral_months),
+        "deferral_type": deferral_type,
+        "monthly_insurance": float(monthly_insurance),
+        "smoothed": bool(smoothed),
+    }
+
+
+def _check_lines(lines):
+    if not lines:
+        raise ValueError("Le montage doit comporter au moins une ligne de prêt.")
+    if sum(line["smoothed"] for line in lines) > 1:
+        raise ValueError("Un seul prêt peut être lissé.")
+    for line in lines:
+        if line["deferral_type"] not in DEFERRAL_TYPES:
+            raise ValueError(f"Type de différé inconnu : {line['deferral_type']!r} (attendu : {', '.join(DEFERRAL_TYPES)})")
+        if not 0 <= line["deferral_months"] < int(line["years"] * 12):
+            raise ValueError(f"Le différé du prêt {line['name']!r} doit être plus court que sa durée.")
+        if line["smoothed"] and line["deferral_months"]:
+            raise ValueError(f"Le prêt lissé {line['name']!r} ne peut pas comporter de différé.")
+
+
+# Soldes restants (mois 0..horizon) pour des échéances données, forme (lignes, horizon + 1)
+def _balances(amounts, rates, payments):
+    months = np.arange(payments.shape[1] + 1)
+    growth = (1 + rates) ** months
+    balances = np.empty_like(growth)
+    balances[:, 0] = amounts[:, 0]
+    balances[:, 1:] = growth[:, 1:] * (amounts - np.cumsum(payments / growth[:, 1:], axis=1))
+    return balances
+
+
+# Échéances bancaires hors lissage : différé puis annuité constante sur la durée restante
+def _scheduled_payments(amounts, rates, terms, deferrals, capitalized, months):
+    principal = np.where(capitalized, amounts * (1 + rates) ** deferrals, amounts)
+    amortizing = terms - deferrals
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = np.where(rates == 0, 1 / amortizing, rates / -np.expm1(-amortizing * np.log1p(rates)))
+    deferral_payment = np.where(capitalized, 0.0, amounts * rates)
+    return np.where(months <= deferrals, deferral_payment, np.where(months <= terms, principal * factor, 0.0))
+
+
+# Mensualité totale constante T telle que les échéances lissées max(T - autres échéances, 0)
+# remboursent exactement le prêt lissé : somme des max(T - o_t, 0) (1 + r)^-t = L.
+# Le membre de gauche est linéaire par morceaux en T ; en triant les o_t, T est calculé pour
+# chaque nombre k de mois actifs et l'on retient celui qui tombe dans son propre intervalle.
+def _smoothed_payments(amount, rate, term, others):
+    others = others[:term]
+    discount = (1 + rate) ** -np.arange(1, term + 1)
+    order = np.argsort(others, kind="stable")
+    sorted_others = others[order]
+    totals = (amount + np.cumsum(sorted_others * discount[order])) / np.cumsum(discount[order])
+    upper = np.append(sorted_others[1:], np.inf)
+    total = totals[np.argmax((totals > sorted_others) & (totals <= upper))]
+    return np.maximum(total - others, 0.0)
+
+
+# Échéancier combiné du montage. Renvoie les noms et montants des lignes, les mois, des tableaux
+# de forme (lignes, mois) : échéances bancaires, assurance, intérêts, capital remboursé et solde
+# restant, ainsi que la mensualité totale (assurance comprise) de chaque mois.
+def project_schedule(lines):
+    _check_lines(lines)
+    amounts = np.array([[line["amount"]] for line in lines])
+    rates = np.array([[line["interest_rate"] / 100 / 12] for line in lines])
+    terms = np.array([[int(line["years"] * 12)] for line in lines])
+    deferrals = np.array([[line["deferral_months"]] for line in lines])
+    capitalized = np.array([[line["deferral_type"] == DEFERRAL_TOTAL] for line in lines])
+    horizon = int(terms.max())
+    months = np.arange(1, horizon + 1)
+
+    payments = _scheduled_payments(amounts, rates, terms, deferrals, capitalized, months)
+    insurance = np.where(months <= terms, np.array([[line["monthly_insurance"]] for line in lines]), 0.0)
+    smoothed = [index for index, line in enumerate(lines) if line["smoothed"]]
+    if smoothed:
+        index = smoothed[0]
+        others = np.delete(payments + insurance, index, axis=0).sum(axis=0)
+        term = int(terms[index, 0])
+        payments[index, :term] = _smoothed_payments(amounts[index, 0], rates[index, 0], term, others)
+
+    balances = _balances(amounts, rates, payments)
+    interest = balances[:, :-1] * rates
+    remaining = np.maximum(balances[:, 1:], 0)
+    return {
+        "names": [line["name"] for line in lines],
+        "amounts": amounts[:, 0],
+        "months": months,
+        "payments": payments,
+        "insurance": insurance,
+        "interest": interest,
+        "principal": payments - interest,
+        "balances": np.where(months <= terms, remaining, 0.0),
+        "total_payment": (payments + insurance).sum(axis=0),
+    }
+
+
+# Synthèse par ligne : montant, durée, première et dernière échéance, intérêts et assurance totaux
+def project_summary(schedule):
+    payments = schedule["payments"]
+    paid = payments > 0
+    first = payments[np.arange(len(payments)), paid.argmax(axis=1)]
+    last = payments[np.arange(len(payments)), payments.shape[1] - 1 - paid[:, ::-1].argmax(axis=1)]
+    return pd.DataFrame({
+        "Prêt": schedule["names"],
+        "Montant (€)": schedule["amounts"],
+        "Durée (mois)": paid.shape[1] - paid[:, ::-1].argmax(axis=1),
+        "Première échéance (€)": first,
+        "Dernière échéance (€)": last,
+        "Intérêts totaux (€)": schedule["interest"].sum(axis=1),
+        "Assurance totale (€)": schedule["insurance"].sum(axis=1),
+    })
+
+
+# Échéancier combiné au format DataFrame : une colonne d'échéance par prêt, puis les totaux
+def project_frame(schedule):
+    frame = {"Mois": schedule["months"]}
+    for name, payments in zip(schedule["names"], schedule["payments"]):
+        frame[f"Échéance {name} (€)"] = payments
+    frame["Assurance (€)"] = schedule["insurance"].sum(axis=0)
+    frame["Mensualité totale (€)"] = schedule["total_payment"]
+    frame["Capital restant dû (€)"] = schedule["balances"].sum(axis=0)
+    return pd.DataFrame(frame)
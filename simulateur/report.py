@@ -0,0 +1,145 @@
+# Rapports PDF des deux pages, rendus entièrement en mémoire.
+#
+# Les fonctions renvoient directement les octets du PDF (aucun fichier temporaire)
+# et sont mémoïsées par paramètres : l'interface ne les appelle qu'au moment du
+# téléchargement et un second téléchargement identique ne coûte rien. fpdf n'est importé
+# qu'au premier rendu, pour ne pas ralentir le démarrage des pages.
+import math
+import re
+from datetime import datetime, time
+
+from simulateur.cache import memoize
+from simulateur.profiling import instrument
+
+
+# Octets du document, quelle que soit la version de fpdf (str en 1.x, bytearray en 2.x)
+def pdf_to_bytes(pdf):
+    data = pdf.output(dest="S")
+    if isinstance(data, str):
+        return data.encode("latin1")
+    return bytes(data)
+
+
+# Fige la date de création inscrite par fpdf dans les métadonnées du document.
+# Le remplacement garde la même longueur, la table des références reste donc valide.
+def freeze_creation_date(data, generated_at):
+    stamp = generated_at.strftime("%Y%m%d%H%M%S").encode("ascii")
+    return re.sub(rb"/CreationDate \(D:\d{14}", b"/CreationDate (D:" + stamp, data, count=1)
+
+
+# Ajoute au document la page du rapport détaillé de la page principale
+def add_loan_report_page(pdf, property_value, interest_rate, years, down_payment, debt_ratio, net_to_gross_ratio,
+                         notary_fee_rate, monthly_payment, loan_amount, total_paid, total_interest, notary_fees,
+                         project_cost, insurance_per_month, taeg=None, generated_at=None):
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+
+    # Titre
+    pdf.set_font("Arial", style="B", size=16)
+    pdf.cell(200, 10, txt="Rapport détaillé - Simulateur de prêt immobilier", ln=True, align="C")
+    pdf.ln(10)
+
+    # Date de génération
+    pdf.set_font("Arial", size=10)
+    current_date = (generated_at or datetime.now()).strftime("%d/%m/%Y")
+    pdf.cell(200, 10, txt=f"Date de génération : {current_date}", ln=True, align="R")
+    pdf.ln(10)
+
+    # Hypothèses de l'utilisateur
+    pdf.set_font("Arial", style="B", size=14)
+    pdf.cell(200, 10, txt="Hypothèses retenues :", ln=True)
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"- Valeur du bien : {property_value:.2f} EUR", ln=True)
+    pdf.cell(200, 10, txt=f"- Taux d'intérêt : {interest_rate:.2f}%", ln=True)
+    pdf.cell(200, 10, txt=f"- Durée du prêt : {years} ans", ln=True)
+    pdf.cell(200, 10, txt=f"- Apport initial : {down_payment:.2f} EUR", ln=True)
+    pdf.cell(200, 10, txt=f"- Frais de notaire retenus : {notary_fee_rate:.2f}%", ln=True)
+    pdf.ln(10)
+
+    # Résultats principaux
+    pdf.set_font("Arial", style="B", size=14)
+    pdf.cell(200, 10, txt="Résultats principaux :", ln=True)
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"- Frais de notaire : {notary_fees:.2f} EUR", ln=True)
+    pdf.cell(200, 10, txt=f"- Coût total du projet : {project_cost:.2f} EUR", ln=True)
+    pdf.cell(200, 10, txt=f"- Montant à emprunter : {loan_amount:.2f} EUR", ln=True)
+    pdf.cell(200, 10, txt=f"- Mensualité : {monthly_payment:.2f} EUR", ln=True)
+    if insurance_per_month:
+        pdf.cell(200, 10, txt=f"- Assurance mensuelle : {insurance_per_month:.2f} EUR", ln=True)
+    if taeg is not None and math.isfinite(taeg):
+        pdf.cell(200, 10, txt=f"- TAEG : {taeg:.2f}%", ln=True)
+    pdf.ln(10)
+
+    # Revenus requis
+    pdf.set_font("Arial", style="B", size=14)
+    pdf.cell(200, 10, txt="Revenus requis :", ln=True)
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"- Revenu net mensuel requis : {(monthly_payment / debt_ratio):.2f} EUR", ln=True)
+    pdf.cell(200, 10, txt=f"- Revenu brut mensuel requis : {(monthly_payment / debt_ratio / net_to_gross_ratio):.2f} EUR", ln=True)
+    pdf.ln(10)
+
+    # Coût total du prêt
+    pdf.set_font("Arial", style="B", size=14)
+    pdf.cell(200, 10, txt="Coût total du prêt :", ln=True)
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"- Coût total du prêt (avec intérêts) : {total_paid:.2f} EUR", ln=True)
+    pdf.cell(200, 10, txt=f"- Intérêts totaux sur la durée du prêt : {total_interest:.2f} EUR", ln=True)
+    pdf.ln(10)
+
+
+# Rapport détaillé de la page principale, daté du jour (ou de generated_at), à la date près.
+# La date fait partie de la clé du cache : un rapport rendu la veille n'est pas resservi.
+def generate_pdf_report(property_value, interest_rate, years, down_payment, debt_ratio, net_to_gross_ratio, notary_fee_rate,
+                        monthly_payment, loan_amount, total_paid, total_interest, notary_fees, project_cost, insurance_per_month,
+                        taeg=None, generated_at=None):
+    generated_at = datetime.combine((generated_at or datetime.now()).date(), time.min)
+    return render_pdf_report(property_value, interest_rate, years, down_payment, debt_ratio, net_to_gross_ratio,
+                             notary_fee_rate, monthly_payment, loan_amount, total_paid, total_interest, notary_fees,
+                             project_cost, insurance_per_month, taeg, generated_at)
+
+
+# Rendu du rapport détaillé ; la date affichée et les métadonnées sont figées à generated_at :
+# le document est reproductible.
+@instrument()
+@memoize(max_entries=32)
+def render_pdf_report(property_value, interest_rate, years, down_payment, debt_ratio, net_to_gross_ratio, notary_fee_rate,
+                      monthly_payment, loan_amount, total_paid, total_interest, notary_fees, project_cost, insurance_per_month,
+                      taeg, generated_at):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    add_loan_report_page(pdf, property_value, interest_rate, years, down_payment, debt_ratio, net_to_gross_ratio,
+                         notary_fee_rate, monthly_payment, loan_amount, total_paid, total_interest, notary_fees,
+                         project_cost, insurance_per_month, taeg, generated_at)
+    return freeze_creation_date(pdf_to_bytes(pdf), generated_at)
+
+
+# Rapport de la page « Valeur maximale du bien »
+@instrument()
+@memoize(max_entries=32)
+def generate_max_property_pdf(monthly_payment, years, interest_rate, down_payment, property_type,
+                              property_value, notary_fees, project_cost, loan_amount):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+
+    if hasattr(pdf, "set_doc_option"):
+        pdf.set_doc_option("core_fonts_encoding", "utf-8")
+        euro_symbol = "€"
+    else:
+        euro_symbol = "EUR"
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.cell(0, 10, "Rapport de simulation", ln=True)
+    pdf.cell(0, 10, f"Mensualité maximale : {monthly_payment:.2f} {euro_symbol}", ln=True)
+    pdf.cell(0, 10, f"Durée du prêt : {years} ans", ln=True)
+    pdf.cell(0, 10, f"Taux d'intérêt : {interest_rate:.2f} %", ln=True)
+    pdf.cell(0, 10, f"Apport personnel : {down_payment:.2f} {euro_symbol}", ln=True)
+    pdf.cell(0, 10, f"Type de bien : {property_type}", ln=True)
+    pdf.ln(5)
+    pdf.cell(0, 10, f"Valeur maximale du bien : {property_value:,.2f} {euro_symbol}", ln=True)
+    pdf.cell(0, 10, f"Frais de notaire : {notary_fees:,.2f} {euro_symbol}", ln=True)
+    pdf.cell(0, 10, f"Coût total du projet : {project_cost:,.2f} {euro_symbol}", ln=True)
+    pdf.cell(0, 10, f"Montant emprunté : {loan_amount:,.2f} {euro_symbol}", ln=True)
+
+    return pdf_to_bytes(pdf)
@@ -0,0 +1,52 @@
+# Surface de sensibilité : mensualité, coût total et intérêts sur une grille
+# taux × durée × apport, calculée en une seule diffusion NumPy.
+import numpy as np
+import pandas as pd
+
+from simulateur.engine import INSURANCE_NONE, insurance_per_month, total_cost
+
+SENSITIVITY_COLUMNS = [
+    "Taux d'intérêt (%)",
+    "Durée (années)",
+    "Apport (€)",
+    "Mensualité (€)",
+    "Coût total (€)",
+    "Intérêts totaux (€)",
+]
+
+
+# Grille complète : chaque tableau de résultats a la forme (taux, durées, apports)
+def sensitivity_grid(project_cost, interest_rates, years, down_payments,
+                     insurance_choice=INSURANCE_NONE, insurance_rate=0, insurance_amount=0):
+    interest_rates = np.asarray(interest_rates, dtype=float)
+    years = np.asarray(years)
+    down_payments = np.asarray(down_payments, dtype=float)
+    shape = (interest_rates.size, years.size, down_payments.size)
+
+    loan_amount = np.maximum(project_cost - down_payments, 0)[np.newaxis, np.newaxis, :]
+    insurance = np.where(loan_amount > 0,
+                         insurance_per_month(loan_amount, insurance_choice, insurance_rate, insurance_amount), 0.0)
+    costs = total_cost(loan_amount, interest_rates[:, np.newaxis, np.newaxis], years[np.newaxis, :, np.newaxis],
+                       insurance)
+
+    return {
+        "interest_rate": interest_rates,
+        "years": years,
+        "down_payment": down_payments,
+        "monthly_payment": np.broadcast_to(costs["monthly_payment_bank"] + insurance, shape),
+        "total_paid": np.broadcast_to(costs["total_paid"], shape),
+        "total_interest": np.broadcast_to(costs["total_interest"], shape),
+    }
+
+
+# Grille à plat (une ligne par combinaison) pour l'export CSV / Parquet
+def sensitivity_frame(grid):
+    rates, terms, downs = np.meshgrid(grid["interest_rate"], grid["years"], grid["down_payment"], indexing="ij")
+    return pd.DataFrame({
+        "Taux d'intérêt (%)": rates.ravel(),
+        "Durée (années)": terms.ravel(),
+        "Apport (€)": downs.ravel(),
+        "Mensualité (€)": grid["monthly_payment"].ravel(),
+        "Coût total (€)": grid["total_paid"].ravel(),
+        "Intérêts totaux (€)": grid["total_interest"].ravel(),
+    }, columns=SENSITIVITY_COLUMNS)
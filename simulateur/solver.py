@@ -0,0 +1,64 @@
+# Valeur maximale du bien finançable, pour un ou des millions de prospects en un appel.
+#
+# Contraintes simultanées : mensualité maximale, taux d'endettement sur un revenu net
+# (charges existantes déduites), assurance proportionnelle au capital ou fixe, durée maximale.
+# La mensualité totale étant linéaire en capital (annuité + assurance sur le capital), le capital
+# et la valeur du bien s'obtiennent en forme fermée. Si les frais de notaire sont donnés par une
+# fonction non linéaire (barème dégressif), la valeur du bien est trouvée par dichotomie vectorisée.
+import numpy as np
+
+from simulateur.engine import NOTARY_FEE_RATES, annuity_factor, monthly_rate
+
+
+# Valeur du bien V telle que V + fees(V) = budget, par dichotomie sur toutes les lignes à la fois.
+# fees doit être croissante et positive ; la précision est exprimée en euros.
+def _solve_property_value(budget, notary_fees, tolerance=0.01, max_iterations=60):
+    low = np.zeros_like(budget)
+    high = np.array(budget, dtype=float)
+    for _ in range(max_iterations):
+        middle = (low + high) / 2
+        too_expensive = middle + notary_fees(middle) > budget
+        high = np.where(too_expensive, middle, high)
+        low = np.where(too_expensive, low, middle)
+        if np.all(high - low <= tolerance):
+            break
+    return low
+
+
+# Résultat sous forme de dictionnaire de tableaux ; `binding_constraint` indique la contrainte
+# qui limite chaque prospect ("mensualité" ou "endettement").
+def max_property_value(down_payment, interest_rate, years, max_payment=np.inf, monthly_income=None,
+                       debt_ratio=0.33, existing_debts=0.0, insurance_rate=0.0, insurance_amount=0.0,
+                       notary_fee_rate=NOTARY_FEE_RATES["Ancien"], notary_fees=None):
+    max_payment = np.asarray(max_payment, dtype=float)
+    if monthly_income is None:
+        debt_capacity = np.full_like(max_payment, np.inf)
+    else:
+        debt_capacity = np.asarray(monthly_income, dtype=float) * debt_ratio - existing_debts
+    payment_capacity = np.minimum(max_payment, debt_capacity)
+    binding_constraint = np.where(max_payment <= debt_capacity, "mensualité", "endettement")
+
+    # Mensualité totale = capital * (facteur d'annuité + taux d'assurance mensuel) + assurance fixe
+    factor = annuity_factor(monthly_rate(interest_rate), np.asarray(years) * 12)
+    loan_amount = np.maximum(payment_capacity - insurance_amount, 0) / (factor + np.asarray(insurance_rate) / 100 / 12)
+    budget = loan_amount + down_payment
+
+    if notary_fees is None:
+        property_value = budget / (1 + np.asarray(notary_fee_rate) / 100)
+        fees = property_value * np.asarray(notary_fee_rate) / 100
+    else:
+        property_value = _solve_property_value(np.asarray(budget, dtype=float), notary_fees)
+        fees = notary_fees(property_value)
+        # Le reliquat de la dichotomie reste en apport : le montant emprunté est ajusté au projet
+        loan_amount = np.maximum(property_value + fees - down_payment, 0)
+
+    insurance = loan_amount * np.asarray(insurance_rate) / 100 / 12 + insurance_amount
+    return {
+        "property_value": property_value,
+        "notary_fees": fees,
+        "project_cost": property_value + fees,
+        "loan_amount": loan_amount,
+        "monthly_payment": loan_amount * factor + insurance,
+        "insurance_per_month": insurance,
+        "binding_constraint": binding_constraint,
+    }
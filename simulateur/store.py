@@ -0,0 +1,283 @@
+# Magasin de scénarios persistant (SQLite, sans service externe).
+#
+# Un scénario est un jeu de paramètres nommé (mêmes champs que simulateur.batch). Ses résultats
+# (chiffres du rapport, tableau d'amortissement, PDF) sont mis en cache sur disque, indexés par
+# l'empreinte SHA-256 des paramètres normalisés : deux scénarios aux paramètres identiques
+# partagent leurs résultats, et un résultat n'est calculé qu'une fois, quelle que soit la
+# session ou le redémarrage du serveur.
+#
+# Chaque résultat porte la version du moteur (empreinte du code source des modules de calcul) :
+# un résultat produit par une autre version est périmé, supprimé et recalculé. La taille totale
+# des résultats est bornée ; au-delà, les moins récemment utilisés sont supprimés.
+#
+# Réglages par variables d'environnement :
+#     SIMULATEUR_STORE_PATH       fichier SQLite (scenarios.sqlite3 par défaut)
+#     SIMULATEUR_STORE_MAX_BYTES  taille maximale des résultats en octets (256 Mo par défaut)
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from simulateur import amortization, engine, report, taeg
+from simulateur.amortization import SCHEDULE_COLUMNS, amortization_arrays
+from simulateur.batch import INPUT_COLUMNS, OUTPUT_COLUMNS
+from simulateur.engine import loan_report
+from simulateur.report import generate_pdf_report
+
+DEFAULT_PATH = os.environ.get("SIMULATEUR_STORE_PATH", "scenarios.sqlite3")
+DEFAULT_MAX_BYTES = int(os.environ.get("SIMULATEUR_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Modules dont dépendent les résultats mis en cache
+ENGINE_MODULES = (engine, amortization, taeg, report)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    name TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    input_hash TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    engine_version TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (input_hash, kind)
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+"""
+
+
+# Empreinte du code source des modules de calcul
+def engine_version():
+    digest = hashlib.sha256()
+    for module in ENGINE_MODULES:
+        with open(module.__file__, "rb") as handle:
+            digest.update(handle.read())
+    return digest.hexdigest()[:16]
+
+
+# Paramètres complétés par leurs valeurs par défaut, nombres convertis en flottants
+def normalize_params(params):
+    unknown = set(params) - set(INPUT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Paramètres inconnus : {', '.join(sorted(unknown))}")
+    missing = [name for name, default in INPUT_COLUMNS.items() if default is None and params.get(name) is None]
+    if missing:
+        raise ValueError(f"Paramètres obligatoires manquants : {', '.join(missing)}")
+    normalized = {}
+    for name, default in INPUT_COLUMNS.items():
+        value = default if params.get(name) is None else params[name]
+        normalized[name] = value if isinstance(value, str) else float(value)
+    return normalized
+
+
+def input_hash(params):
+    text = json.dumps(normalize_params(params), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Résultats mis en cache : calcul à partir des paramètres normalisés, encodage en octets, décodage
+def _report(params):
+    result = loan_report(**params)
+    return {name: float(result[name]) for name in OUTPUT_COLUMNS}
+
+
+def _schedule(params):
+    figures = _report(params)
+    arrays = amortization_arrays(figures["loan_amount"], params["interest_rate"], int(params["years"]),
+                                 figures["insurance_per_month"])
+    return pd.DataFrame({column: arrays[column] for column in SCHEDULE_COLUMNS}, columns=SCHEDULE_COLUMNS)
+
+
+def _pdf(params):
+    figures = _report(params)
+    return generate_pdf_report(
+        params["property_value"], params["interest_rate"], int(params["years"]), params["down_payment"],
+        params["debt_ratio"], params["net_to_gross_ratio"], params["notary_fee_rate"], figures["monthly_payment"],
+        figures["loan_amount"], figures["total_paid"], figures["total_interest"], figures["notary_fees"],
+        figures["project_cost"], figures["insurance_per_month"], figures["taeg"],
+    )
+
+
+def _encode_json(value):
+    return json.dumps(value).encode("utf-8")
+
+
+# Tableau d'amortissement : colonnes float64 compressées (format .npz)
+def _encode_frame(frame):
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **{column: frame[column].to_numpy() for column in SCHEDULE_COLUMNS})
+    return buffer.getvalue()
+
+
+def _decode_frame(data):
+    with np.load(io.BytesIO(data)) as arrays:
+        return pd.DataFrame({column: arrays[column] for column in SCHEDULE_COLUMNS}, columns=SCHEDULE_COLUMNS)
+
+
+RESULT_KINDS = {
+    "report": (_report, _encode_json, json.loads),
+    "schedule": (_schedule, _encode_frame, _decode_frame),
+    "pdf": (_pdf, bytes, bytes),
+}
+
+
+class ScenarioStore:
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.engine_version = engine_version()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    # Une connexion par opération (le magasin est partagé entre les sessions, donc entre fils
+    # d'exécution) : transaction validée ou annulée, puis connexion fermée
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def save(self, name, params):
+        name = name.strip()
+        if not name:
+            raise ValueError("Le nom du scénario ne peut pas être vide.")
+        params = normalize_params(params)
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO scenarios (name, params, input_hash, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET params = excluded.params, input_hash = excluded.input_hash, "
+                "updated = excluded.updated",
+                (name, json.dumps(params, ensure_ascii=False), input_hash(params),
+                 datetime.now().isoformat(timespec="seconds")),
+            )
+        return name
+
+    def load(self, name):
+        with self._connect() as connection:
+            row = connection.execute("SELECT params FROM scenarios WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise ValueError(f"Scénario inconnu : {name!r}")
+        return json.loads(row["params"])
+
+    def delete(self, name):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM scenarios WHERE name = ?", (name,))
+
+    # Scénarios enregistrés, du plus récent au plus ancien
+    def scenarios(self):
+        with self._connect() as connection:
+            rows = connection.execute("SELECT name, params, updated FROM scenarios ORDER BY updated DESC, name").fetchall()
+        return [{"name": row["name"], "params": json.loads(row["params"]), "updated": row["updated"]} for row in rows]
+
+    # Résultat `kind` (voir RESULT_KINDS) pour des paramètres : lu sur disque s'il existe et a été
+    # produit par la version courante du moteur, sinon calculé et enregistré
+    def result(self, params, kind="report"):
+        compute, encode, decode = RESULT_KINDS[kind]
+        params = normalize_params(params)
+        key = input_hash(params)
+        # Le PDF porte la date du jour : il n'est resservi que le jour de son rendu
+        kind = f"{kind}:{date.today().isoformat()}" if kind == "pdf" else kind
+        with self._connect() as connection:
+            row = connection.execute("SELECT engine_version, data FROM results WHERE input_hash = ? AND kind = ?",
+                                     (key, kind)).fetchone()
+            if row is not None and row["engine_version"] == self.engine_version:
+                connection.execute("UPDATE results SET last_used = ? WHERE input_hash = ? AND kind = ?",
+                                   (time.time(), key, kind))
+                self._count(hits=1)
+                return decode(row["data"])
+        self._count(misses=1, stale=int(row is not None))
+
+        value = compute(params)
+        data = encode(value)
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (input_hash, kind, engine_version, data, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, self.engine_version, data, len(data), time.time()),
+            )
+            self._evict(connection)
+        return value
+
+    # Supprime les résultats les moins récemment utilisés au-delà de la taille maximale
+    def _evict(self, connection):
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for row in connection.execute("SELECT input_hash, kind, size FROM results ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((row["input_hash"], row["kind"]))
+            total -= row["size"]
+        connection.executemany("DELETE FROM results WHERE input_hash = ? AND kind = ?", evicted)
+        self._count(evictions=len(evicted))
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, increment in increments.items():
+                setattr(self, name, getattr(self, name) + increment)
+
+    # Comparaison de scénarios côte à côte : une colonne par scénario, paramètres puis résultats
+    def compare(self, names):
+        columns = {}
+        for name in names:
+            params = self.load(name)
+            columns[name] = {**params, **self.result(params, "report")}
+        return pd.DataFrame(columns, index=list(INPUT_COLUMNS) + OUTPUT_COLUMNS)
+
+    def clear_results(self):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM results")
+
+    def stats(self):
+        with self._connect() as connection:
+            entries, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            scenarios = connection.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+        with self._lock:
+            return {
+                "path": self.path,
+                "engine_version": self.engine_version,
+                "scenarios": scenarios,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+            }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+# Magasin partagé par toutes les sessions du processus, un par fichier
+def open_store(path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = ScenarioStore(path, max_bytes)
+        return store
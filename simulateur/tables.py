@@ -0,0 +1,50 @@
+# Préparation des grands tableaux pour l'affichage : synthèse annuelle et pagination.
+#
+# Un tableau d'amortissement compte jusqu'à 360 lignes (davantage pour un remboursement
+# anticipé détaillé) : la page n'en envoie au navigateur qu'une synthèse par année, le détail
+# mensuel d'une année choisie ou une page de mois, en nombres bruts (le format est appliqué
+# par le navigateur). Les fichiers téléchargés restent complets.
+import math
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PAGE_SIZE = 60
+# Colonnes additionnées sur l'année ; le solde retenu est celui de fin d'année
+SUMMED_COLUMNS = ["Mensualité", "Capital", "Intérêt", "Assurance"]
+
+
+# Colonnes de la synthèse annuelle
+SUMMARY_COLUMNS = ["Année", "Mois"] + SUMMED_COLUMNS + ["Solde restant"]
+
+
+# Synthèse annuelle d'un tableau d'amortissement (colonnes SCHEDULE_COLUMNS) ; un tableau vide
+# (prêt nul ou soldé d'emblée) donne une synthèse vide
+def yearly_summary(schedule):
+    if schedule.empty:
+        return pd.DataFrame({column: pd.Series(dtype=int if column in ("Année", "Mois") else float)
+                             for column in SUMMARY_COLUMNS})
+    years = (schedule["Mois"].to_numpy() - 1) // 12 + 1
+    starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+    ends = np.r_[starts[1:], years.size] - 1
+    summary = {"Année": years[starts], "Mois": ends - starts + 1}
+    for column in SUMMED_COLUMNS:
+        summary[column] = np.add.reduceat(schedule[column].to_numpy(), starts)
+    summary["Solde restant"] = schedule["Solde restant"].to_numpy()[ends]
+    return pd.DataFrame(summary, columns=SUMMARY_COLUMNS)
+
+
+# Mois d'une année du tableau (détail d'une ligne de la synthèse)
+def year_months(schedule, year):
+    months = schedule["Mois"].to_numpy()
+    return schedule[(months - 1) // 12 + 1 == year]
+
+
+def page_count(rows, page_size=DEFAULT_PAGE_SIZE):
+    return max(1, math.ceil(rows / page_size))
+
+
+# Page `number` (à partir de 1) d'un tableau
+def page(frame, number, page_size=DEFAULT_PAGE_SIZE):
+    start = (number - 1) * page_size
+    return frame.iloc[start:start + page_size]
@@ -0,0 +1,105 @@
+# TAEG (taux annuel effectif global) : taux actuariel qui égalise le montant réellement mis
+# à disposition (capital moins frais de dossier et de garantie) et la valeur actualisée de
+# tout ce que l'emprunteur rembourse (échéances et assurance).
+#
+# Le taux mensuel i est le TRI des flux ; le TAEG est son équivalent annuel (1 + i)^12 - 1.
+# La résolution est un Newton vectorisé sur des lots de prêts, partant d'un point à gauche
+# de la racine (la VAN y est positive et convexe, la convergence est donc monotone). Les lignes
+# qui ne convergent pas sont reprises par dichotomie.
+import numpy as np
+
+DEFAULT_TOLERANCE = 1e-12
+DEFAULT_MAX_ITERATIONS = 50
+# Bornes de la dichotomie de secours (taux mensuels)
+_LOWER_RATE = -0.5
+_UPPER_RATE = 1.0
+
+
+# Flux de trésorerie côté emprunteur, forme (..., mois + 1) : capital net de frais au mois 0,
+# puis échéances et assurance en négatif. Pour des flux irréguliers, construire le tableau
+# directement et le passer à irr.
+def cash_flows(loan_amount, monthly_payment, months, monthly_insurance=0.0, bank_fees=0.0, guarantee_fees=0.0):
+    net_amount = np.asarray(loan_amount, dtype=float) - bank_fees - guarantee_fees
+    outflow = np.asarray(monthly_payment, dtype=float) + monthly_insurance
+    shape = np.broadcast_shapes(net_amount.shape, outflow.shape)
+    flows = np.empty(shape + (int(months) + 1,))
+    flows[..., 0] = net_amount
+    flows[..., 1:] = -outflow[..., np.newaxis]
+    return flows
+
+
+# VAN des flux (dernier axe = mois) et sa dérivée par rapport au taux mensuel
+def _npv(flows, rate):
+    periods = np.arange(flows.shape[-1])
+    discount = np.exp(-periods * np.log1p(rate)[..., np.newaxis])
+    npv = (flows * discount).sum(axis=-1)
+    derivative = -(flows * periods * discount).sum(axis=-1) / (1 + rate)
+    return npv, derivative
+
+
+# Valeur actuelle d'une annuité unitaire sur n mois, a(i) = (1 - (1 + i)^-n) / i, et sa dérivée
+def _annuity(rate, months):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = np.where(rate == 0, months, -np.expm1(-months * np.log1p(rate)) / rate)
+        discount = np.exp(-(months + 1) * np.log1p(rate))
+        derivative = np.where(rate == 0, -months * (months + 1) / 2, (months * discount - value) / rate)
+    return value, derivative
+
+
+def _bisect(function, shape, iterations=100):
+    low = np.full(shape, _LOWER_RATE)
+    high = np.full(shape, _UPPER_RATE)
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        positive = function(middle) > 0
+        low = np.where(positive, middle, low)
+        high = np.where(positive, high, middle)
+    return (low + high) / 2
+
+
+# Newton vectorisé ; `equation(rate, rows)` renvoie la fonction (décroissante en taux) et sa
+# dérivée pour les lignes `rows` du lot (Ellipsis : toutes). La dichotomie de secours ne porte
+# que sur les lignes qui n'ont pas convergé.
+def _solve(equation, shape, guess, tolerance, max_iterations):
+    rate = np.broadcast_to(np.asarray(guess, dtype=float), shape).copy()
+    converged = np.zeros(shape, dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(max_iterations):
+            value, derivative = equation(rate, Ellipsis)
+            step = value / derivative
+            rate = np.where(converged, rate, rate - step)
+            converged |= np.abs(step) <= tolerance
+            if converged.all():
+                break
+
+        failed = ~converged | ~np.isfinite(rate) | (rate <= _LOWER_RATE)
+        if failed.any():
+            rate[failed] = _bisect(lambda candidate: equation(candidate, failed)[0], int(failed.sum()))
+    return rate
+
+
+# Taux de rendement interne mensuel de flux quelconques (dernier axe = mois), par lots
+def irr(flows, guess=0.0, tolerance=DEFAULT_TOLERANCE, max_iterations=DEFAULT_MAX_ITERATIONS):
+    flows = np.asarray(flows, dtype=float)
+    return _solve(lambda rate, rows: _npv(flows[rows], rate), flows.shape[:-1], guess, tolerance, max_iterations)
+
+
+# Taux annuel équivalent en % à partir d'un taux mensuel
+def annual_rate(monthly_rate):
+    return np.expm1(12 * np.log1p(monthly_rate)) * 100
+
+
+# TAEG en % d'un prêt à échéances constantes, vectorisé (scalaires ou tableaux).
+# Les flux étant constants, la VAN s'écrit en forme fermée et chaque itération coûte O(1) par prêt.
+def taeg(loan_amount, monthly_payment, months, monthly_insurance=0.0, bank_fees=0.0, guarantee_fees=0.0,
+         tolerance=DEFAULT_TOLERANCE, max_iterations=DEFAULT_MAX_ITERATIONS):
+    net_amount = np.asarray(loan_amount, dtype=float) - bank_fees - guarantee_fees
+    outflow = np.asarray(monthly_payment, dtype=float) + monthly_insurance
+    months = np.asarray(months, dtype=float)
+    net_amount, outflow, months = np.broadcast_arrays(net_amount, outflow, months)
+
+    def equation(rate, rows):
+        value, derivative = _annuity(rate, months[rows])
+        return outflow[rows] * value - net_amount[rows], outflow[rows] * derivative
+
+    return annual_rate(_solve(equation, net_amount.shape, 0.0, tolerance, max_iterations))
@@ -0,0 +1,37 @@
+# Préchauffage du processus : les tables de calcul partagées par toutes les sessions sont
+# construites une seule fois, dans les caches mémoïsés du processus (simulateur.cache).
+#
+# warm_up() est appelé au début de chaque exécution des pages mais n'agit qu'une fois par
+# processus ; la construction se fait en tâche de fond pour ne pas retarder le premier rendu.
+# Le service HTTP l'appelle de façon synchrone au démarrage.
+import threading
+
+from simulateur.affordability import affordability_index
+
+# Taux d'assurance (% du capital par an) dont l'index d'accessibilité est préparé
+WARM_INSURANCE_RATES = (0.0, 0.3)
+
+_started = False
+_lock = threading.Lock()
+
+
+# Tables usuelles : facteurs de mensualité de la grille taux × durées par défaut
+def warm_tables():
+    for insurance_rate in WARM_INSURANCE_RATES:
+        affordability_index(insurance_rate=insurance_rate)
+
+
+# Lance le préchauffage une seule fois par processus ; renvoie le fil d'exécution (None s'il
+# a déjà été lancé ou si background=False)
+def warm_up(background=True):
+    global _started
+    with _lock:
+        if _started:
+            return None
+        _started = True
+    if not background:
+        warm_tables()
+        return None
+    thread = threading.Thread(target=warm_tables, name="simulateur-warmup", daemon=True)
+    thread.start()
+    return thread